@@ -0,0 +1,158 @@
+# Backend/activity_queue.py - Batched, off-request-path UserActivity writes
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from models import UserActivity
+from rollups import record_activities
+from trending import trending_sites
+
+ACTIVITY_QUEUE_MAX_SIZE = int(os.getenv("ACTIVITY_QUEUE_MAX_SIZE", "10000"))
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "1.0"))
+# How long enqueue() waits for room in a full queue before dropping the activity
+ACTIVITY_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("ACTIVITY_ENQUEUE_TIMEOUT_SECONDS", "2.0"))
+
+_STOP = object()
+
+
+class ActivityWriter:
+    """Bounded in-process queue of UserActivity documents flushed with insert_many"""
+
+    def __init__(
+        self,
+        max_size: int = ACTIVITY_QUEUE_MAX_SIZE,
+        batch_size: int = ACTIVITY_BATCH_SIZE,
+        flush_interval: float = ACTIVITY_FLUSH_INTERVAL_SECONDS
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background flusher (called from the app lifespan)"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued and stop the flusher"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def enqueue(self, activity: UserActivity):
+        """Queue an activity without waiting for the database write"""
+        trending_sites.observe(activity)
+        if not self.running:
+            # No flusher (e.g. scripts, shutdown): write synchronously
+            await self._flush([activity])
+            return
+
+        try:
+            self._queue.put_nowait(activity)
+        except asyncio.QueueFull:
+            # Backpressure: the caller waits for room, bounded by a timeout
+            self.backpressure_waits += 1
+            try:
+                await asyncio.wait_for(self._queue.put(activity), ACTIVITY_ENQUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return
+        self.enqueued += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[UserActivity] = [item]
+
+            # Flush when the batch is full or the interval has elapsed
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Drain whatever is left after the stop marker
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i:i + self.batch_size])
+
+    async def _flush(self, batch: List[UserActivity]):
+        started = time.perf_counter()
+        try:
+            await UserActivity.insert_many(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed_flushes += 1
+            print(f"Failed to write {len(batch)} user activities: {e}")
+        else:
+            try:
+                await record_activities(batch)
+            except Exception as e:
+                print(f"Failed to roll up {len(batch)} user activities: {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "backpressure_waits": self.backpressure_waits,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0
+        }
+
+
+# Global writer, started in main.lifespan and drained in database.close_database
+activity_writer = ActivityWriter()
@@ -4,10 +4,17 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, List, Set, Tuple, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+import asyncio
 import os
-from models import User
-from pydantic import BaseModel
+import time
+from models import User, GeoPoint, CategoryType
+from beanie import PydanticObjectId
+from server_timing import timed
+from pydantic import BaseModel, ConfigDict, Field
 
 # Security configuration - Load from environment variables
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -17,11 +24,283 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Version of the claim set in access tokens (role, active flag, security epoch)
+TOKEN_CLAIMS_VERSION = 1
+# Claims of tokens issued less than this long ago are trusted without a database check
+TOKEN_CLAIMS_TRUST_SECONDS = int(os.getenv("TOKEN_CLAIMS_TRUST_SECONDS", "300"))
+# Database epoch checks of older tokens are reused this long (at most the trust window)
+TOKEN_EPOCH_CACHE_SECONDS = min(int(os.getenv("TOKEN_EPOCH_CACHE_SECONDS", "30")), TOKEN_CLAIMS_TRUST_SECONDS)
+
+# Authenticated users are cached briefly so protected requests skip the user lookup
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+# Password hashing; hashes below BCRYPT_ROUNDS are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt runs in a bounded thread pool (it releases the GIL) so it never blocks the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash/verify calls allowed to wait for a worker before new ones are rejected with 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop with a bounded queue and fast-fail under overload"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.completed += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash uses outdated settings"""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed_password)
+        if valid and new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "avg_ms": round(self.total_ms / self.completed, 3) if self.completed else 0.0,
+            "max_ms": round(self.max_ms, 3)
+        }
+
+password_hasher = PasswordHasher()
 
 # Bearer token scheme
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+class AuthenticatedUser(BaseModel):
+    """Read-only view of the caller's User document handed to route handlers.
+
+    Loaded with a projection (no password hash, no legacy favorites list), so it is
+    frozen and has no save(): writes go through User documents loaded in full.
+    """
+    model_config = ConfigDict(frozen=True, populate_by_name=True)
+
+    id: PydanticObjectId = Field(alias="_id")
+    email: str
+    first_name: str
+    last_name: str
+    current_location: Optional[GeoPoint] = None
+    preferred_categories: List[CategoryType] = []
+    is_active: bool = True
+    is_admin: bool = False
+    is_verified: bool = False
+    security_epoch: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    last_login: Optional[datetime] = None
+
+# Fields read for AuthenticatedUser (everything else stays in the database)
+AUTHENTICATED_USER_PROJECTION = {
+    name: 1 for name in AuthenticatedUser.model_fields if name != "id"
+}
+
+class PrincipalCache:
+    """Short-TTL cache of authenticated users keyed by token (sub, iat).
+
+    Entries are dropped explicitly when a user's account state changes;
+    the TTL bounds staleness for changes made by other worker processes.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[float, AuthenticatedUser]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[Tuple[str, Any]]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, sub: str, iat: Any) -> Optional[AuthenticatedUser]:
+        key = (sub, iat)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._remove(key)
+        self.misses += 1
+        return None
+
+    def put(self, sub: str, iat: Any, user: AuthenticatedUser):
+        if self.ttl_seconds <= 0:
+            return
+        key = (sub, iat)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(sub, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: str):
+        """Drop every cached principal of a user (deactivation, role change, ...)"""
+        for key in self._keys_by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+        self.invalidations += 1
+
+    def _remove(self, key: Tuple[str, Any]):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "users": len(self._keys_by_user),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+principal_cache = PrincipalCache()
+
+class Principal(BaseModel):
+    """Identity and role of the caller, as carried by the token claims
+    (is_admin may lag a demotion: see confirm_admin)"""
+    id: str
+    email: Optional[str] = None
+    first_name: str = ""
+    last_name: str = ""
+    is_admin: bool = False
+    is_active: bool = True
+    security_epoch: int = 0
+
+    @classmethod
+    def from_user(cls, user: AuthenticatedUser) -> "Principal":
+        return cls(
+            id=str(user.id),
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_admin=user.is_admin,
+            is_active=user.is_active,
+            security_epoch=user.security_epoch
+        )
+
+class TokenRevocations:
+    """Per-user minimum security epoch for immediate lockouts, plus a short-lived
+    cache of epochs checked against the database for older tokens.
+
+    Both are process-local: a revocation in another worker reaches this one through
+    the database check, so claim-trusted tokens lose access within
+    TOKEN_CLAIMS_TRUST_SECONDS and older tokens within TOKEN_EPOCH_CACHE_SECONDS.
+    """
+
+    MAX_CHECKED = 10000
+
+    def __init__(self):
+        self._min_epoch: Dict[str, Tuple[int, float]] = {}  # user_id -> (min epoch, revoked at)
+        self._checked: Dict[str, Tuple[float, Optional[int]]] = {}  # user_id -> (valid until, epoch)
+        self.revocations = 0
+        self.db_checks = 0
+        self.rejected = 0
+
+    def revoke(self, user_id: str, new_epoch: int):
+        """Reject every token of the user issued before new_epoch"""
+        self._prune()
+        current = self._min_epoch.get(user_id, (0, 0.0))[0]
+        self._min_epoch[user_id] = (max(new_epoch, current), time.time())
+        self._checked.pop(user_id, None)
+        self.revocations += 1
+
+    def is_revoked(self, user_id: str, epoch: int) -> bool:
+        entry = self._min_epoch.get(user_id)
+        return entry is not None and epoch < entry[0]
+
+    def _prune(self):
+        # Once every token issued before a revocation has expired, the entry is not needed
+        expired_before = time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for user_id in [u for u, (_, revoked_at) in self._min_epoch.items() if revoked_at < expired_before]:
+            del self._min_epoch[user_id]
+
+    async def current_epoch(self, user_id: str) -> Optional[int]:
+        """The user's security epoch from the database (None if the user is gone), cached briefly"""
+        cached = self._checked.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        self.db_checks += 1
+        epoch = None
+        if ObjectId.is_valid(user_id):
+            doc = await User.get_motor_collection().find_one({"_id": ObjectId(user_id)}, {"security_epoch": 1})
+            epoch = doc.get("security_epoch", 0) if doc else None
+        if len(self._checked) >= self.MAX_CHECKED:
+            self._checked.clear()
+            self._prune()
+        self._checked[user_id] = (time.monotonic() + TOKEN_EPOCH_CACHE_SECONDS, epoch)
+        return epoch
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "revoked_users": len(self._min_epoch),
+            "revocations": self.revocations,
+            "db_checks": self.db_checks,
+            "rejected": self.rejected,
+            "trust_seconds": TOKEN_CLAIMS_TRUST_SECONDS,
+            "epoch_cache_seconds": TOKEN_EPOCH_CACHE_SECONDS
+        }
+
+token_revocations = TokenRevocations()
+
+def _revoked_token_error() -> HTTPException:
+    token_revocations.rejected += 1
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token is no longer valid, please log in again",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
 class AuthService:
     @staticmethod
@@ -34,6 +313,16 @@ class AuthService:
         """Hash a password"""
         return pwd_context.hash(password)
     
+    @staticmethod
+    async def hash_password(password: str) -> str:
+        """Hash a password in the bcrypt worker pool"""
+        return await password_hasher.hash(password)
+    
+    @staticmethod
+    async def verify_password_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password in the bcrypt worker pool; also returns an upgraded hash if due"""
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         """Create a JWT access token"""
@@ -43,10 +332,27 @@ class AuthService:
         else:
             expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "iat": datetime.utcnow()})
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     
+    @staticmethod
+    def create_user_token(user: User, expires_delta: Optional[timedelta] = None) -> str:
+        """Access token carrying the versioned claim set checked by get_current_principal"""
+        return AuthService.create_access_token(
+            data={
+                "sub": str(user.id),
+                "ver": TOKEN_CLAIMS_VERSION,
+                "role": "admin" if user.is_admin else "user",
+                "act": user.is_active,
+                "epoch": user.security_epoch,
+                "email": user.email,
+                "first_name": user.first_name,
+                "last_name": user.last_name
+            },
+            expires_delta=expires_delta
+        )
+    
     @staticmethod
     async def verify_token(token: str) -> dict:
         """Verify and decode JWT token"""
@@ -68,12 +374,16 @@ class AuthService:
             )
     
     @staticmethod
-    async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthenticatedUser:
         """Get current user from JWT token"""
         payload = await AuthService.verify_token(credentials.credentials)
         user_id = payload.get("sub")
         
-        user = await User.get(user_id)
+        user = principal_cache.get(user_id, payload.get("iat"))
+        if user is None:
+            user = await AuthService.load_principal(user_id)
+            if user is not None:
+                principal_cache.put(user_id, payload.get("iat"), user)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,6 +391,11 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        if "epoch" in payload and (
+            payload["epoch"] != user.security_epoch or token_revocations.is_revoked(user_id, payload["epoch"])
+        ):
+            raise _revoked_token_error()
+        
         if not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -90,7 +405,15 @@ class AuthService:
         return user
     
     @staticmethod
-    async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    async def load_principal(user_id: str) -> Optional[AuthenticatedUser]:
+        """Load the read-only view of a user for authentication"""
+        if not ObjectId.is_valid(user_id):
+            return None
+        doc = await User.get_motor_collection().find_one({"_id": ObjectId(user_id)}, AUTHENTICATED_USER_PROJECTION)
+        return AuthenticatedUser.model_validate(doc) if doc else None
+    
+    @staticmethod
+    async def get_admin_user(current_user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
         """Get current user if they are admin"""
         if not current_user.is_admin:
             raise HTTPException(
@@ -100,9 +423,90 @@ class AuthService:
         return current_user
 
 # Dependency function (needed for FastAPI)
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthenticatedUser:
     """Dependency to get current user"""
-    return await AuthService.get_current_user(credentials)
+    with timed("auth"):
+        return await AuthService.get_current_user(credentials)
+
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Lightweight dependency for routes that only need identity and role.
+
+    Versioned tokens are validated from their claims alone; tokens older than
+    TOKEN_CLAIMS_TRUST_SECONDS get a (cached) security epoch check against the database.
+    """
+    with timed("auth"):
+        return await _principal_from_token(credentials)
+
+async def _principal_from_token(credentials: HTTPAuthorizationCredentials) -> Principal:
+    payload = await AuthService.verify_token(credentials.credentials)
+    if payload.get("ver") != TOKEN_CLAIMS_VERSION:
+        # Tokens issued before the claim set existed
+        return Principal.from_user(await AuthService.get_current_user(credentials))
+
+    user_id = payload["sub"]
+    epoch = payload.get("epoch", 0)
+    if token_revocations.is_revoked(user_id, epoch):
+        raise _revoked_token_error()
+    if time.time() - payload.get("iat", 0) > TOKEN_CLAIMS_TRUST_SECONDS:
+        if await token_revocations.current_epoch(user_id) != epoch:
+            raise _revoked_token_error()
+    if not payload.get("act", False):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    return Principal(
+        id=user_id,
+        email=payload.get("email"),
+        first_name=payload.get("first_name", ""),
+        last_name=payload.get("last_name", ""),
+        is_admin=payload.get("role") == "admin",
+        is_active=True,
+        security_epoch=epoch
+    )
+
+async def is_admin_token(token: str) -> bool:
+    """Whether a token belongs to an active admin.
+
+    Only tokens claiming the admin role get a lookup; the role itself is taken from
+    the database (through the principal cache, like get_admin_user), since claims
+    can outlive a demotion made in another worker.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    if payload.get("ver") != TOKEN_CLAIMS_VERSION or payload.get("role") != "admin" or not payload.get("act", False):
+        return False
+    user_id = payload.get("sub", "")
+    if token_revocations.is_revoked(user_id, payload.get("epoch", 0)):
+        return False
+    user = principal_cache.get(user_id, payload.get("iat"))
+    if user is None:
+        user = await AuthService.load_principal(user_id)
+        if user is None:
+            return False
+        principal_cache.put(user_id, payload.get("iat"), user)
+    return user.is_admin and user.is_active and user.security_epoch == payload.get("epoch")
+
+async def confirm_admin(principal: Principal) -> bool:
+    """Re-check a principal's admin claim against the database before admin-only actions"""
+    if not principal.is_admin:
+        return False
+    user = await AuthService.load_principal(principal.id)
+    return user is not None and user.is_admin and user.is_active and user.security_epoch == principal.security_epoch
+
+async def get_optional_user_id(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[str]:
+    """Dependency returning the token subject when a valid token is sent (no database lookup)"""
+    if credentials is None:
+        return None
+    try:
+        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        return payload.get("sub")
+    except JWTError:
+        return None
+
+async def get_admin_user(current_user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
+    """Dependency to get current user if they are admin"""
+    return await AuthService.get_admin_user(current_user)
 
 # Pydantic models for authentication
 class UserCreate(BaseModel):
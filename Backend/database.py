@@ -1,20 +1,38 @@
 import os
 import motor.motor_asyncio
-from beanie import init_beanie
-from typing import Optional
+from pymongo import UpdateOne
+from typing import Dict, Optional
 import asyncio
 
 # Import all models
 from models import (
     CulturalSite, 
     User, 
+    Favorite,
     Category, 
     ParkingLot,
     UserActivity,
+    ActivityRollup,
+    SiteNeighbors,
     Review,
     District,
+    SiteSummary,
     CategoryType
 )
+from query_advisor import query_recorder, QUERY_SHAPE_RECORDING
+from metrics import mongo_metrics_listener
+from server_timing import phase_timing_listener
+from db_pool import pool_listener, pool_options, warm_up_pool
+from schema_version import (
+    STARTUP_INDEX_SYNC, StartupPhases, index_fingerprint, init_models, read_index_marker, write_index_marker
+)
+from slow_queries import slow_query_log
+from activity_queue import activity_writer
+from view_tracker import view_tracker
+from rollups import activity_retention
+from recommendations import site_recommender
+from trending import trending_sites
+from stats_snapshot import overview_stats
 
 class DatabaseManager:
     """MongoDB connection and management class"""
@@ -22,6 +40,7 @@ class DatabaseManager:
     def __init__(self):
         self.client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
         self.database = None
+        self.startup_phases: Dict[str, float] = {}
         
     async def connect_to_database(self, database_url: str = None, database_name: str = "chemnitz_culture_db"):
         """Initialize MongoDB connection and Beanie ODM"""
@@ -30,33 +49,59 @@ class DatabaseManager:
             database_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
         
         try:
-            # Create Motor client
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(database_url)
+            # Create Motor client (command listeners feed /metrics, Server-Timing, the slow query log and the query shape recorder;
+            # the pool listener feeds /metrics and /api/health). Pool sizing comes from MONGODB_* settings in db_pool.py
+            event_listeners = [mongo_metrics_listener, phase_timing_listener, slow_query_log, pool_listener]
+            if QUERY_SHAPE_RECORDING:
+                event_listeners.append(query_recorder)
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(
+                database_url, event_listeners=event_listeners, **pool_options()
+            )
             self.database = self.client[database_name]
+            phases = StartupPhases()
             
             # Test connection
-            await self.client.admin.command('ping')
+            with phases.phase("connect"):
+                await self.client.admin.command('ping')
             print(f"Connected to MongoDB at {database_url}")
             
-            # Initialize Beanie with all document models
-            await init_beanie(
-                database=self.database,
-                document_models=[
-                    CulturalSite,
-                    User,
-                    Category, 
-                    ParkingLot,
-                    UserActivity,
-                    Review,
-                    District
-                ]
-            )
+            # Open pooled connections now so the first requests after a deploy don't pay for them
+            with phases.phase("pool_warmup"):
+                await warm_up_pool(self.client)
             
-            print("Beanie ODM initialized with all models")
-            print("Database indexes created automatically")
+            # Index sync is skipped when the last sync recorded the same index definitions
+            models = [
+                CulturalSite,
+                User,
+                Favorite,
+                Category, 
+                ParkingLot,
+                UserActivity,
+                ActivityRollup,
+                SiteNeighbors,
+                Review,
+                District,
+                SiteSummary
+            ]
+            fingerprint = index_fingerprint(models)
+            with phases.phase("schema_check"):
+                indexes_current = STARTUP_INDEX_SYNC != "always" and await read_index_marker(self.database) == fingerprint
+            
+            # Initialize Beanie with all document models
+            with phases.phase("init_beanie"):
+                await init_models(self.database, models, skip_indexes=indexes_current)
+            if indexes_current:
+                print(f"Beanie ODM initialized with all models (indexes current: {fingerprint})")
+            else:
+                await write_index_marker(self.database, fingerprint)
+                print(f"Beanie ODM initialized with all models, indexes synced ({fingerprint})")
             
             # Create default data
-            await self.create_default_categories()
+            with phases.phase("default_categories"):
+                await self.create_default_categories()
+            
+            self.startup_phases = phases.phases
+            print(phases.summary())
             
         except Exception as e:
             print(f"Failed to connect to MongoDB: {e}")
@@ -102,16 +147,17 @@ class DatabaseManager:
             }
         ]
         
-        for category_data in default_categories:
-            # Check if category already exists
-            existing = await Category.find_one(Category.name == category_data["name"])
-            
-            if not existing:
-                category = Category(**category_data)
-                await category.save()
-                print(f"Created category: {category_data['display_name']}")
-            else:
-                print(f"Category already exists: {category_data['display_name']}")
+        # One idempotent bulk upsert; existing categories are left untouched
+        result = await Category.get_motor_collection().bulk_write([
+            UpdateOne(
+                {"name": category_data["name"].value},
+                {"$setOnInsert": {**category_data, "name": category_data["name"].value}},
+                upsert=True
+            )
+            for category_data in default_categories
+        ], ordered=False)
+        if result.upserted_count:
+            print(f"Created {result.upserted_count} default categories")
     
     async def get_database_stats(self):
         """Get database statistics for monitoring"""
@@ -147,6 +193,14 @@ async def init_database():
 
 async def close_database():
     """Close database connection (call this on shutdown)"""
+    # Pending view counts and queued activities must reach the database before the client goes away
+    await overview_stats.stop()
+    await slow_query_log.stop()
+    await trending_sites.stop()
+    await site_recommender.stop()
+    await activity_retention.stop()
+    await view_tracker.stop()
+    await activity_writer.stop()
     await db_manager.close_database_connection()
 
 async def test_database_connection():
@@ -0,0 +1,177 @@
+# Backend/db_pool.py - MongoDB connection pool settings, warm-up and pool event metrics
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+from metrics import Counter, Histogram, registry, register_gauge
+
+# Pool sizing (per process; every uvicorn worker has its own pool)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "0"))  # 0 = never close idle connections
+MONGODB_MAX_CONNECTING = int(os.getenv("MONGODB_MAX_CONNECTING", "2"))
+# How long a request waits for a free connection before failing (0 = wait indefinitely)
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+# Connections opened at startup before serving requests (defaults to the minimum pool size)
+MONGODB_POOL_WARMUP = int(os.getenv("MONGODB_POOL_WARMUP", str(MONGODB_MIN_POOL_SIZE)))
+MONGODB_POOL_WARMUP_TIMEOUT_SECONDS = float(os.getenv("MONGODB_POOL_WARMUP_TIMEOUT_SECONDS", "5"))
+
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def pool_options() -> Dict[str, Any]:
+    """Keyword arguments for AsyncIOMotorClient"""
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxConnecting": MONGODB_MAX_CONNECTING
+    }
+    if MONGODB_MAX_IDLE_TIME_MS > 0:
+        options["maxIdleTimeMS"] = MONGODB_MAX_IDLE_TIME_MS
+    if MONGODB_WAIT_QUEUE_TIMEOUT_MS > 0:
+        options["waitQueueTimeoutMS"] = MONGODB_WAIT_QUEUE_TIMEOUT_MS
+    return options
+
+
+pool_connections_created = registry.register(Counter(
+    "mongodb_pool_connections_created_total", "MongoDB connections opened"))
+pool_connections_closed = registry.register(Counter(
+    "mongodb_pool_connections_closed_total", "MongoDB connections closed by reason", ("reason",)))
+pool_checkouts = registry.register(Counter(
+    "mongodb_pool_checkouts_total", "Connections checked out of the pool"))
+pool_checkout_failures = registry.register(Counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts by reason", ("reason",)))
+pool_checkout_wait = registry.register(Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time from checkout request to connection", (), POOL_WAIT_BUCKETS))
+pool_clears = registry.register(Counter(
+    "mongodb_pool_cleared_total", "Pool clears (connections dropped after a network error or failover)"))
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Connection pool events as metrics (called from the driver's threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.max_in_use = 0
+        self.max_waiting = 0
+        self.max_wait_ms = 0.0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.timeouts = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pool_clears.inc()
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_connections_created.inc()
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections_closed.inc((str(event.reason),))
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        # Checkout start and result are reported on the same thread
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        pool_checkouts.inc()
+        pool_checkout_wait.observe((), waited)
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.max_wait_ms = max(self.max_wait_ms, waited * 1000)
+
+    def connection_check_out_failed(self, event):
+        self._waited()
+        pool_checkout_failures.inc((str(event.reason),))
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.timeouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def _waited(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_pool_size": MONGODB_MAX_POOL_SIZE,
+            "min_pool_size": MONGODB_MIN_POOL_SIZE,
+            "wait_queue_timeout_ms": MONGODB_WAIT_QUEUE_TIMEOUT_MS or None,
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_in_use": self.max_in_use,
+            "max_waiting": self.max_waiting,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "checkout_timeouts": self.timeouts
+        }
+
+
+# Global listener, registered on the Motor client in database.py
+pool_listener = PoolMetricsListener()
+
+register_gauge("mongodb_pool_connections_open", "Open MongoDB connections", lambda: pool_listener.open)
+register_gauge("mongodb_pool_connections_in_use", "MongoDB connections checked out", lambda: pool_listener.in_use)
+register_gauge("mongodb_pool_checkouts_waiting", "Requests waiting for a MongoDB connection", lambda: pool_listener.waiting)
+
+
+async def warm_up_pool(client, connections: int = MONGODB_POOL_WARMUP) -> int:
+    """Open up to `connections` pooled connections before serving; returns the pool size.
+
+    Concurrent pings open connections in parallel (bounded by maxConnecting), then
+    we wait for the driver's minPoolSize maintenance to fill the pool to its minimum.
+    """
+    if connections <= 0:
+        return pool_listener.open
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(client.admin.command("ping") for _ in range(connections)),
+        return_exceptions=True
+    )
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    target = min(connections, MONGODB_MIN_POOL_SIZE)
+    deadline = time.monotonic() + MONGODB_POOL_WARMUP_TIMEOUT_SECONDS
+    while pool_listener.open < target and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    print(f"MongoDB pool warm-up: {pool_listener.open} connections open "
+          f"({failed} pings failed) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return pool_listener.open
@@ -3,6 +3,7 @@ import csv
 import asyncio
 from typing import Dict, Any, Optional
 from database import init_database, close_database
+from summaries import rebuild_summaries
 from models import CulturalSite, ParkingLot, District, CategoryType, ParkingType
 
 class ChemnitzDataImporter:
@@ -473,6 +474,10 @@ async def main():
         count = await CulturalSite.find({"category": category}).count()
         print(f"   {category.value}: {count}")
     
+    # Refresh materialized summaries for the API
+    await rebuild_summaries()
+    print("\nSite summaries rebuilt")
+    
     # Close database
     await close_database()
     print("\nComplete data import finished successfully!")
@@ -0,0 +1,137 @@
+# Backend/leaderboard.py - In-memory popularity ranking for /api/search/popular
+
+import asyncio
+import os
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import CulturalSite
+
+# Full resync interval; picks up writes made by other worker processes
+LEADERBOARD_RESYNC_SECONDS = int(os.getenv("LEADERBOARD_RESYNC_SECONDS", "300"))
+
+OVERALL = "__all__"
+
+# (-favorite_count, -view_count, -created_at timestamp, site_id): ascending order = most popular first
+RankKey = Tuple[int, int, float, str]
+
+
+def _bucket(category) -> str:
+    """Normalize CategoryType members and raw strings to the same dict key"""
+    return getattr(category, "value", category) or OVERALL
+
+
+def _rank_key(site_id: str, favorite_count: int, view_count: int, created_at: Optional[datetime]) -> RankKey:
+    return (-favorite_count, -view_count, -(created_at.timestamp() if created_at else 0.0), site_id)
+
+
+class PopularityLeaderboard:
+    """Active sites ranked by favorites, views and recency, overall and per category"""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}  # site_id -> category, counts, created_at
+        self._ranked: Dict[str, List[RankKey]] = {}  # OVERALL / category value -> sorted keys
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def top(self, category: Optional[str] = None, limit: int = 10) -> Optional[List[str]]:
+        """Site ids of the top entries, or None while the leaderboard is still cold"""
+        if not self.is_loaded:
+            self.schedule_refresh()
+            return None
+        if time.monotonic() - self._loaded_at > LEADERBOARD_RESYNC_SECONDS:
+            self.schedule_refresh()  # Serve the current ranking while resyncing
+        ranked = self._ranked.get(_bucket(category), [])
+        return [key[3] for key in ranked[:limit]]
+
+    def schedule_refresh(self):
+        """Start a background resync unless one is already running"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def refresh(self):
+        """Load the ranking fields of all active sites in one projected query"""
+        try:
+            cursor = CulturalSite.get_motor_collection().find(
+                {"is_active": True},
+                {"category": 1, "favorite_count": 1, "view_count": 1, "created_at": 1}
+            )
+            entries = {}
+            async for doc in cursor:
+                entries[str(doc["_id"])] = {
+                    "category": _bucket(doc.get("category")),
+                    "favorite_count": doc.get("favorite_count", 0),
+                    "view_count": doc.get("view_count", 0),
+                    "created_at": doc.get("created_at")
+                }
+
+            ranked: Dict[str, List[RankKey]] = {OVERALL: []}
+            for site_id, entry in entries.items():
+                key = self._key(site_id, entry)
+                ranked[OVERALL].append(key)
+                ranked.setdefault(entry["category"], []).append(key)
+            for keys in ranked.values():
+                keys.sort()
+
+            self._entries = entries
+            self._ranked = ranked
+            self._loaded_at = time.monotonic()
+        except Exception as e:
+            print(f"Failed to load popularity leaderboard: {e}")
+
+    def category_of(self, site_id: str) -> Optional[str]:
+        """Category of an active site, or None if unknown (or not loaded yet)"""
+        entry = self._entries.get(site_id)
+        return entry["category"] if entry else None
+
+    def adjust(self, site_id: str, favorites: int = 0, views: int = 0):
+        """Apply favorite/view count deltas for a site"""
+        entry = self._entries.get(site_id)
+        if entry is None:
+            return
+        self._unrank(site_id, entry)
+        entry["favorite_count"] = max(0, entry["favorite_count"] + favorites)
+        entry["view_count"] = max(0, entry["view_count"] + views)
+        self._rank(site_id, entry)
+
+    def apply(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply a site change (facets from summaries.site_facets, None = not active)"""
+        if not self.is_loaded:
+            return
+        if before and before["id"] in self._entries:
+            self._unrank(before["id"], self._entries.pop(before["id"]))
+        if after:
+            entry = {
+                "category": _bucket(after["category"]),
+                "favorite_count": after["favorite_count"],
+                "view_count": after["view_count"],
+                "created_at": after["created_at"]
+            }
+            self._entries[after["id"]] = entry
+            self._rank(after["id"], entry)
+
+    def _key(self, site_id: str, entry: Dict[str, Any]) -> RankKey:
+        return _rank_key(site_id, entry["favorite_count"], entry["view_count"], entry["created_at"])
+
+    def _rank(self, site_id: str, entry: Dict[str, Any]):
+        key = self._key(site_id, entry)
+        insort(self._ranked.setdefault(OVERALL, []), key)
+        insort(self._ranked.setdefault(entry["category"], []), key)
+
+    def _unrank(self, site_id: str, entry: Dict[str, Any]):
+        key = self._key(site_id, entry)
+        for bucket in (OVERALL, entry["category"]):
+            keys = self._ranked.get(bucket, [])
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+
+# Global leaderboard instance
+popularity_leaderboard = PopularityLeaderboard()
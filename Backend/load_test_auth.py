@@ -0,0 +1,90 @@
+"""
+Load test: map requests latency while a burst of logins is running.
+Start the API first (python main.py), then run:
+    python load_test_auth.py --email you@example.com --password secret
+Compares p50/p99 of /api/cultural-sites with and without concurrent logins.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def map_requests(client: httpx.AsyncClient, count: int, concurrency: int):
+    """Latencies (ms) of map-style reads"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get("/api/cultural-sites", params={"limit": 100})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return latencies
+
+
+async def login_burst(client: httpx.AsyncClient, count: int, email: str, password: str):
+    """Status code counts of concurrent logins"""
+    statuses = {}
+
+    async def one():
+        response = await client.post("/api/auth/login", json={"email": email, "password": password})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return statuses
+
+
+def report(name, latencies):
+    print(f"{name:<28} n={len(latencies):<5} "
+          f"p50={percentile(latencies, 50):7.1f} ms  "
+          f"p99={percentile(latencies, 99):7.1f} ms  "
+          f"mean={statistics.mean(latencies):7.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Map latency under a login burst")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=100)
+    args = parser.parse_args()
+
+    print("AUTH LOAD TEST")
+    print("=" * 50)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await map_requests(client, 20, 5)  # Warm up
+
+        baseline = await map_requests(client, args.requests, args.concurrency)
+        report("map requests (idle)", baseline)
+
+        started = time.perf_counter()
+        latencies, statuses = await asyncio.gather(
+            map_requests(client, args.requests, args.concurrency),
+            login_burst(client, args.logins, args.email, args.password)
+        )
+        report(f"map requests ({args.logins} logins)", latencies)
+        print(f"Login statuses: {statuses} in {time.perf_counter() - started:.1f} s")
+
+        p99_ratio = percentile(latencies, 99) / max(percentile(baseline, 99), 0.001)
+        print(f"p99 ratio under login burst: {p99_ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Concurrency check: hundreds of parallel favorite add/remove toggles for one user and site.
+Start the API first (python main.py), then run:
+    python load_test_favorites.py --email you@example.com --password secret --site-id <id>
+Afterwards the site's favorite_count must equal its Favorite rows, with no duplicate
+(user_id, site_id) pairs. Exits with status 1 when either check fails.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+from bson import ObjectId
+from dotenv import load_dotenv
+import motor.motor_asyncio
+
+load_dotenv()
+
+
+async def toggles(client: httpx.AsyncClient, site_id: str, count: int, concurrency: int, headers: dict):
+    """Status code counts of concurrent adds/removes, plus a few bulk toggles"""
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            kind = random.choice(("add", "remove", "bulk"))
+            if kind == "add":
+                response = await client.post(f"/api/favorites/{site_id}", headers=headers)
+            elif kind == "remove":
+                response = await client.delete(f"/api/favorites/{site_id}", headers=headers)
+            else:
+                operations = [{"action": random.choice(("add", "remove")), "site_id": site_id} for _ in range(2)]
+                response = await client.post("/api/favorites/bulk", json=operations, headers=headers)
+            key = f"{kind} {response.status_code}"
+            statuses[key] = statuses.get(key, 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return statuses
+
+
+async def check_consistency(site_id: str) -> bool:
+    """favorite_count equals the Favorite rows of the site, and no pair is duplicated"""
+    client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    db = client["chemnitz_culture_db"]
+    try:
+        site = await db["cultural_sites"].find_one({"_id": ObjectId(site_id)}, {"favorite_count": 1})
+        rows = await db["favorites"].count_documents({"site_id": site_id})
+        duplicates = await db["favorites"].aggregate([
+            {"$match": {"site_id": site_id}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]).to_list(None)
+    finally:
+        client.close()
+
+    favorite_count = (site or {}).get("favorite_count", 0)
+    print(f"favorite_count={favorite_count}  favorite rows={rows}  duplicated users={len(duplicates)}")
+    return favorite_count == rows and not duplicates
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent favorite toggles for one user and site")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--site-id", required=True)
+    parser.add_argument("--toggles", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    print("FAVORITES CONCURRENCY TEST")
+    print("=" * 50)
+    if not await check_consistency(args.site_id):
+        print("Counter already inconsistent before the test; results would be meaningless")
+        sys.exit(1)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        response = await client.post("/api/auth/login", json={"email": args.email, "password": args.password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        started = time.perf_counter()
+        statuses = await toggles(client, args.site_id, args.toggles, args.concurrency, headers)
+        print(f"{args.toggles} toggles in {time.perf_counter() - started:.1f} s: {dict(sorted(statuses.items()))}")
+
+    if any(key.endswith(" 500") for key in statuses):
+        print("FAILED: server errors during the toggles")
+        sys.exit(1)
+    if not await check_consistency(args.site_id):
+        print("FAILED: favorite_count does not match the favorites collection")
+        sys.exit(1)
+    print("OK: favorite_count matches the favorites collection")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
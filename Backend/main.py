@@ -7,10 +7,26 @@ load_dotenv()
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
 # Import database init/close
-from database import init_database, close_database
+from database import init_database, close_database, db_manager
+from activity_queue import activity_writer
+from view_tracker import view_tracker
+from leaderboard import popularity_leaderboard
+from rollups import activity_retention
+from recommendations import site_recommender
+from trending import trending_sites
+from stats_snapshot import overview_stats
+from search_cache import search_cache
+from auth import principal_cache, is_admin_token
+from metrics import MetricsMiddleware, registry as metrics_registry, register_gauge
+from request_context import RequestContextMiddleware
+from server_timing import ServerTimingMiddleware, TimedJSONResponse, install_phase_hooks
+from profiling import ProfileMiddleware
+from slow_queries import slow_query_log
+from db_pool import pool_listener
 
 # Import all routers
 from routers.categories import router as categories_router
@@ -22,6 +38,10 @@ from routers.auth_router import router as auth_router
 from routers.search import router as search_router
 from routers.favorites import router as favorites_router
 from routers.geospatial import router as geospatial_router
+from routers.admin import router as admin_router
+from routers.analytics import router as analytics_router
+from routers.reviews import router as reviews_router
+from routers.me import router as me_router
 
 # -------------- Lifespan (startup/shutdown) ----------------
 
@@ -31,6 +51,15 @@ async def lifespan(app: FastAPI):
     print("Starting Chemnitz Cultural Sites API...")
     await init_database()
     print("Database initialized and ready!")
+    # Beacons validate site ids against the leaderboard, so load it before serving
+    await popularity_leaderboard.refresh()
+    activity_writer.start()
+    view_tracker.start()
+    activity_retention.start()
+    site_recommender.start()
+    trending_sites.start()
+    overview_stats.start()
+    slow_query_log.start(db_manager.client)
     yield
     # Shutdown
     print("Shutting down API...")
@@ -45,9 +74,13 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse
 )
 
+# Handler/serialize/model phases for the Server-Timing header
+install_phase_hooks()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -61,6 +94,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request count/latency per route template for /metrics
+app.add_middleware(MetricsMiddleware)
+# Makes the current request visible to the MongoDB command listeners (slow query log)
+app.add_middleware(RequestContextMiddleware)
+# Server-Timing header with auth/db/handler/model/serialize phases (admin tokens only by default)
+app.add_middleware(ServerTimingMiddleware, is_admin_token=is_admin_token)
+# Sampled call-stack profile of one request for admins (?__profile=1)
+app.add_middleware(ProfileMiddleware)
+
+register_gauge("activity_queue_depth", "UserActivity records waiting to be written", lambda: activity_writer.stats()["queue_depth"])
+register_gauge("activity_dropped_total", "UserActivity records dropped under backpressure", lambda: activity_writer.dropped)
+register_gauge("view_tracker_pending_views", "Views counted but not yet flushed", lambda: view_tracker.stats()["pending_views"])
+register_gauge("search_cache_entries", "Entries in the search result cache", lambda: search_cache.stats()["entries"])
+register_gauge("search_cache_hit_ratio", "Search result cache hit ratio", lambda: search_cache.stats()["hit_ratio"])
+register_gauge("principal_cache_hit_ratio", "Authenticated-user cache hit ratio", lambda: principal_cache.stats()["hit_ratio"])
+
 # -------------- Include Routers ----------------------------
 
 # Note: each router file defines prefix="/api/…"
@@ -73,6 +122,10 @@ app.include_router(auth_router)
 app.include_router(search_router)
 app.include_router(favorites_router)
 app.include_router(geospatial_router)
+app.include_router(admin_router)
+app.include_router(analytics_router)
+app.include_router(reviews_router)
+app.include_router(me_router)
 
 # -------------- Root / Health Check can live here  ----------
 
@@ -85,10 +138,20 @@ async def root():
         "status": "operational"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, MongoDB and pipeline metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/health")
 async def health_check():
     """Health check just returns a 200 if connected. (Database stats are in Stats router.)"""
-    return {"status": "healthy", "database": "connected", "api_version": "1.0.0"}
+    return {
+        "status": "healthy",
+        "database": "connected",
+        "database_pool": pool_listener.stats(),
+        "api_version": "1.0.0"
+    }
 
 # -------------- Run with uvicorn if __main__ ----------------
 
@@ -0,0 +1,74 @@
+"""
+Move favorites from the embedded User.favorite_sites list to the favorites collection.
+Safe to run more than once: existing (user_id, site_id) pairs are skipped.
+Run: python migrate_favorites.py
+"""
+
+import asyncio
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+
+from database import init_database, close_database
+from models import User, Favorite, UserActivity, ActivityType
+
+
+async def migrate_user(user_doc) -> int:
+    """Copy one user's favorites, using the latest FAVORITE activity as favorited_at"""
+    user_id = str(user_doc["_id"])
+    site_ids = list(dict.fromkeys(user_doc.get("favorite_sites") or []))
+    if not site_ids:
+        return 0
+
+    activities = await UserActivity.aggregate([
+        {"$match": {"user_id": user_id, "activity_type": ActivityType.FAVORITE, "site_id": {"$in": site_ids}}},
+        {"$group": {"_id": "$site_id", "favorited_at": {"$max": "$timestamp"}}}
+    ]).to_list()
+    favorited_at = {a["_id"]: a["favorited_at"] for a in activities}
+    fallback = user_doc.get("updated_at") or user_doc.get("created_at") or datetime.utcnow()
+
+    docs = [
+        {"user_id": user_id, "site_id": site_id, "favorited_at": favorited_at.get(site_id, fallback)}
+        for site_id in site_ids
+    ]
+    inserted = len(docs)
+    try:
+        await Favorite.get_motor_collection().insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Duplicates come from an earlier (partial) run
+        inserted = e.details.get("nInserted", 0)
+        other_errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+        if other_errors:
+            raise
+
+    await User.get_motor_collection().update_one({"_id": user_doc["_id"]}, {"$unset": {"favorite_sites": ""}})
+    return inserted
+
+
+async def main():
+    print("FAVORITES MIGRATION")
+    print("=" * 50)
+
+    await init_database()
+
+    users = User.get_motor_collection().find(
+        {"favorite_sites.0": {"$exists": True}},
+        {"favorite_sites": 1, "created_at": 1, "updated_at": 1}
+    )
+    migrated_users = 0
+    migrated_favorites = 0
+    async for user_doc in users:
+        try:
+            migrated_favorites += await migrate_user(user_doc)
+            migrated_users += 1
+        except Exception as e:
+            print(f"Failed to migrate favorites of user {user_doc['_id']}: {e}")
+
+    print(f"Users migrated: {migrated_users}")
+    print(f"Favorites created: {migrated_favorites}")
+
+    await close_database()
+    print("\nFavorites migration finished!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
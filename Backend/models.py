@@ -1,5 +1,7 @@
 from beanie import Document, Indexed
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.collation import Collation
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -9,6 +11,10 @@ class GeoPoint(BaseModel):
     type: str = "Point"
     coordinates: List[float]  # [longitude, latitude]
 
+# German collation for site names ("Ärztehaus" sorts with "A", not after "Z").
+# Name sorts must be issued with this collation to use the matching indexes.
+GERMAN_COLLATION = Collation(locale="de")
+
 # Category enumeration for validation
 class CategoryType(str, Enum):
     THEATRE = "theatre"
@@ -61,6 +67,12 @@ class CulturalSite(Document):
     view_count: int = 0
     favorite_count: int = 0
     
+    # Rating aggregates, maintained atomically by the reviews router
+    rating_sum: int = 0
+    rating_count: int = 0
+    rating_avg: float = 0.0
+    rating_histogram: Dict[str, int] = {}  # "1".."5" -> number of reviews
+    
     class Settings:
         name = "cultural_sites"
         indexes = [
@@ -68,7 +80,16 @@ class CulturalSite(Document):
             "category",  # Filter by category
             "is_active",  # Active sites only
             "source",    # Group by data source
-            [("name", "text"), ("description", "text"), ("address", "text")]  # Text search
+            [("name", "text"), ("description", "text"), ("address", "text")],  # Text search
+            # Popularity ranking (leaderboard cold-start fallback)
+            [("is_active", 1), ("favorite_count", -1), ("view_count", -1), ("created_at", -1)],
+            [("is_active", 1), ("category", 1), ("favorite_count", -1), ("view_count", -1), ("created_at", -1)],
+            # Name sorting under German collation
+            IndexModel([("is_active", ASCENDING), ("name", ASCENDING)], collation=GERMAN_COLLATION, name="is_active_name_de"),
+            IndexModel([("is_active", ASCENDING), ("category", ASCENDING), ("name", ASCENDING)], collation=GERMAN_COLLATION, name="is_active_category_name_de"),
+            # Top-rated lists and rating filters/sorts
+            [("is_active", 1), ("rating_avg", -1), ("rating_count", -1)],
+            [("is_active", 1), ("category", 1), ("rating_avg", -1), ("rating_count", -1)]
         ]
 
 # User Model for Authentication
@@ -86,13 +107,14 @@ class User(Document):
     current_location: Optional[GeoPoint] = None
     
     # User preferences and data
-    favorite_sites: List[str] = []  # References to CulturalSite documents
+    favorite_sites: List[str] = []  # Legacy; moved to Favorite by migrate_favorites.py
     preferred_categories: List[CategoryType] = []
     
     # Account management
     is_active: bool = True
     is_admin: bool = False
     is_verified: bool = False
+    security_epoch: int = 0  # Bumped on lockouts/role changes; tokens carrying an older epoch are rejected
     
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -107,6 +129,20 @@ class User(Document):
             "is_admin"
         ]
 
+# User Favorites (one document per user/site pair)
+class Favorite(Document):
+    user_id: str  # Reference to User
+    site_id: str  # Reference to CulturalSite
+    favorited_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "favorites"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("site_id", ASCENDING)], unique=True),  # Membership checks
+            IndexModel([("user_id", ASCENDING), ("favorited_at", DESCENDING)]),  # Listing by time
+            "site_id"
+        ]
+
 # Parking Lot Model (from CSV data)
 class ParkingType(str, Enum):
     BUS = "bus"
@@ -170,7 +206,45 @@ class UserActivity(Document):
             "user_id",
             "site_id", 
             "activity_type",
-            "timestamp"
+            "timestamp",
+            [("user_id", 1), ("timestamp", -1), ("_id", -1)]  # Per-user history with keyset cursors
+        ]
+
+# Time-bucketed activity counts (see rollups.py)
+class ActivityRollup(Document):
+    granularity: str  # "hour" or "day"
+    bucket_start: datetime
+    scope: str  # "site" or "category"
+    key: str  # site_id or category value
+    category: Optional[str] = None
+    
+    # Activity type -> count in this bucket
+    counts: Dict[str, int] = {}
+    
+    class Settings:
+        name = "activity_rollups"
+        indexes = [
+            IndexModel(
+                [("scope", ASCENDING), ("granularity", ASCENDING), ("key", ASCENDING), ("bucket_start", ASCENDING)],
+                unique=True
+            ),
+            [("scope", 1), ("granularity", 1), ("bucket_start", 1)]
+        ]
+
+# Precomputed "also favorited" neighbours of a site (see recommendations.py)
+class SiteNeighbors(Document):
+    site_id: str
+    
+    # [{"site_id", "score"}], most similar first
+    neighbors: List[Dict[str, Any]] = []
+    favorite_count: int = 0  # Users that favorited the site when the list was built
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "site_neighbors"
+        indexes = [
+            IndexModel([("site_id", ASCENDING)], unique=True)
         ]
 
 # Review Model (Optional for Interactive Part)
@@ -198,7 +272,9 @@ class Review(Document):
             "site_id",
             "user_id",
             "rating",
-            "is_active"
+            "is_active",
+            IndexModel([("user_id", ASCENDING), ("site_id", ASCENDING)], unique=True),  # One review per user and site
+            [("site_id", 1), ("is_active", 1), ("created_at", -1)]  # Review lists of a site
         ]
 
 # District/Region Model (from Stadtteile.geojson)
@@ -219,4 +295,25 @@ class District(Document):
         indexes = [
             [("geometry", "2dsphere")],
             "name"
-        ]
\ No newline at end of file
+        ]
+
+# Materialized summaries kept up to date by the write paths (see summaries.py)
+class SiteSummary(Document):
+    key: str  # e.g. "filter_values"
+    
+    # Active site counts per dropdown value
+    sources: Dict[str, int] = {}
+    districts: Dict[str, int] = {}
+    
+    # created_at bounds of active sites
+    oldest_created_at: Optional[datetime] = None
+    newest_created_at: Optional[datetime] = None
+    date_range_stale: bool = False  # Set when a bound site was removed
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "site_summaries"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True)
+        ]
@@ -0,0 +1,171 @@
+# Backend/profiling.py - Sampled call-stack profile of a single request for admins (?__profile=1)
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from auth import is_admin_token
+from request_context import bearer_token
+
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+# Sampling stops after this long even if the request is still running
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+Frame = Tuple[str, str, int]  # function, file, first line
+
+
+class StackSampler:
+    """Samples the call stack of one thread (the event loop) from a background thread.
+
+    Every coroutine scheduled on the loop during the request is sampled, so
+    profiles of a busy instance include other requests; idle time shows up
+    as the loop waiting in its selector.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000,
+                 max_seconds: float = PROFILE_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Dict[Tuple[Frame, ...], List[float]] = {}  # stack -> [count, seconds]
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        started = last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            # Weighted by the time since the previous sample: a thread holding the GIL delays sampling
+            now = time.perf_counter()
+            entry = self.samples.setdefault(tuple(stack), [0, 0.0])
+            entry[0] += 1
+            entry[1] += now - last
+            last = now
+            self.sample_count += 1
+            if now - started > self.max_seconds:
+                break
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format (flamegraph.pl, speedscope, inferno)"""
+        def name(frame: Frame) -> str:
+            return f"{frame[0]} ({os.path.basename(frame[1])}:{frame[2]})".replace(";", ":")
+
+        lines = [";".join(name(f) for f in stack) + f" {entry[0]}"
+                 for stack, entry in sorted(self.samples.items(), key=lambda x: -x[1][0])]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """speedscope 'sampled' profile document, weights in seconds"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, (_, seconds) in self.samples.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(seconds)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "chemnitz-culture-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+
+async def _send_body(send, status: int, body: bytes, content_type: str, headers: List[Tuple[bytes, bytes]] = ()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode()), *headers]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class ProfileMiddleware:
+    """Runs a request under the stack sampler when an admin adds ?__profile=1.
+
+    The endpoint's response is discarded and the profile is returned instead:
+    collapsed stacks by default, speedscope JSON with &__profile_format=speedscope.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or b"__profile" not in scope.get("query_string", b""):
+            await self.app(scope, receive, send)
+            return
+        params = parse_qs(scope["query_string"].decode("latin-1"))
+        if params.get("__profile", [""])[0] not in ("1", "true"):
+            await self.app(scope, receive, send)
+            return
+
+        token = bearer_token(scope)
+        if token is None or not await is_admin_token(token):
+            body = json.dumps({"detail": "Profiling requires an admin token"}).encode()
+            await _send_body(send, 403, body, "application/json")
+            return
+
+        status_code = 500
+
+        async def discard(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            sampler.stop()
+
+        name = f"{scope['method']} {scope['path']}"
+        headers = [
+            (b"x-profiled-status", str(status_code).encode()),
+            (b"x-profile-samples", str(sampler.sample_count).encode())
+        ]
+        if params.get("__profile_format", ["collapsed"])[0] == "speedscope":
+            body = json.dumps(sampler.speedscope(name)).encode()
+            headers.append((b"content-disposition", b'attachment; filename="profile.speedscope.json"'))
+            await _send_body(send, 200, body, "application/json", headers)
+        else:
+            await _send_body(send, 200, sampler.collapsed().encode(), "text/plain; charset=utf-8", headers)
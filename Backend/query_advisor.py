@@ -0,0 +1,259 @@
+# Backend/query_advisor.py - Query shape recorder and compound index advisor
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+QUERY_SHAPE_RECORDING = os.getenv("QUERY_SHAPE_RECORDING", "true").lower() == "true"
+QUERY_SHAPE_MAX_SHAPES = int(os.getenv("QUERY_SHAPE_MAX_SHAPES", "500"))
+
+# Commands whose filters/sorts are worth indexing
+RECORDED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Operators that make a field a range (not equality) predicate for the ESR rule
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$regex", "$exists", "$not"}
+# Predicates that are served by their own special indexes
+SKIPPED_OPERATORS = {"$near", "$nearSphere", "$geoWithin", "$geoIntersects", "$text", "$where", "$expr"}
+
+
+def normalize(value: Any) -> Any:
+    """Replace literals with '?' so that queries differing only in values share a shape"""
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            return [normalize(v) for v in value]
+        return "?"
+    return "?"
+
+
+def extract_query(command_name: str, command: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Filter and sort specification of a command (aggregations: leading $match/$sort)"""
+    if command_name == "find":
+        return command.get("filter") or {}, command.get("sort") or {}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        query: Dict[str, Any] = {}
+        sort: Dict[str, Any] = {}
+        if pipeline and "$match" in pipeline[0]:
+            query = pipeline[0]["$match"]
+            if len(pipeline) > 1 and "$sort" in pipeline[1]:
+                sort = pipeline[1]["$sort"]
+        elif pipeline and "$sort" in pipeline[0]:
+            sort = pipeline[0]["$sort"]
+        return query, sort
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query") or {}, command.get("sort") or {}
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return updates[0].get("q") or {}, {}
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return deletes[0].get("q") or {}, {}
+    return {}, {}
+
+
+def shape_of(collection: str, command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized, literal-free description of a command"""
+    query, sort = extract_query(command_name, command)
+    return {
+        "collection": collection,
+        "command": command_name,
+        "filter": normalize(query),
+        "sort": dict(sort)
+    }
+
+
+def shape_id(shape: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+class QueryShapeRecorder(monitoring.CommandListener):
+    """PyMongo command listener that aggregates timings per normalized query shape"""
+
+    def __init__(self, max_shapes: int = QUERY_SHAPE_MAX_SHAPES):
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Tuple[str, Dict[str, Any]]] = {}
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self.dropped_shapes = 0
+
+    # --- CommandListener interface (called from the driver's worker threads) ---
+
+    def started(self, event):
+        if event.command_name not in RECORDED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            return
+        shape = shape_of(collection, event.command_name, command)
+        sid = shape_id(shape)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (sid, shape)
+            if sid not in self._shapes:
+                if len(self._shapes) >= self.max_shapes:
+                    self.dropped_shapes += 1
+                    return
+                self._shapes[sid] = {
+                    "shape": shape,
+                    "database": event.database_name,
+                    "sample": {k: copy.deepcopy(v) for k, v in command.items()
+                               if not k.startswith("$") and k not in ("lsid", "txnNumber")},
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0
+                }
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return
+            stats = self._shapes.get(pending[0])
+            if stats is None:
+                return
+            duration_ms = event.duration_micros / 1000
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+    # --- Reporting ---
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Recorded shapes with timings, slowest total time first"""
+        with self._lock:
+            shapes = [
+                {
+                    "id": sid,
+                    **stats["shape"],
+                    "count": stats["count"],
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 3) if stats["count"] else 0.0,
+                    "max_ms": round(stats["max_ms"], 3),
+                    "total_ms": round(stats["total_ms"], 3)
+                }
+                for sid, stats in self._shapes.items()
+            ]
+        return sorted(shapes, key=lambda s: s["total_ms"], reverse=True)
+
+    def sample(self, sid: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            stats = self._shapes.get(sid)
+            return (stats["database"], copy.deepcopy(stats["sample"])) if stats else None
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self.dropped_shapes = 0
+
+
+def _plan_stages(plan: Any, stages: List[str]):
+    """Collect stage names of an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            if key in ("inputStage", "inputStages", "winningPlan", "queryPlan", "queryPlanner", "stages", "$cursor", "shards"):
+                _plan_stages(value, stages)
+        if "$sort" in plan:
+            stages.append("$sort")
+    elif isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, stages)
+
+
+def propose_index(shape: Dict[str, Any], query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Compound index proposal following the equality-sort-range rule.
+
+    An ``is_active: true`` equality becomes a partial filter instead of a key,
+    since almost every query on soft-deletable collections carries it.
+    """
+    equality: List[str] = []
+    ranges: List[str] = []
+    partial: Dict[str, Any] = {}
+
+    for field, condition in shape["filter"].items():
+        if field.startswith("$"):
+            continue  # $or/$and branches need separate indexes
+        if isinstance(condition, dict):
+            operators = set(condition)
+            if operators & SKIPPED_OPERATORS:
+                continue
+            if operators & RANGE_OPERATORS:
+                ranges.append(field)
+            else:
+                equality.append(field)  # $in / $eq / $all
+        else:
+            equality.append(field)
+
+    if "is_active" in equality and query.get("is_active") is True:
+        equality.remove("is_active")
+        partial = {"is_active": True}
+
+    keys = [[f, 1] for f in equality]
+    keys += [[f, d] for f, d in shape["sort"].items() if f not in equality]
+    keys += [[f, 1] for f in ranges if f not in shape["sort"]]
+    if not keys:
+        return None
+    return {"keys": keys, "partial_filter": partial or None}
+
+
+async def analyze(client, recorder: "QueryShapeRecorder", min_count: int = 1) -> List[Dict[str, Any]]:
+    """Explain every recorded shape and flag collection scans and in-memory sorts"""
+    report = []
+    for shape in recorder.snapshot():
+        if shape["count"] < min_count or shape["command"] in ("update", "delete"):
+            continue
+        sample = recorder.sample(shape["id"])
+        if sample is None:
+            continue
+        database, command = sample
+        try:
+            explain = await client[database].command({"explain": command, "verbosity": "queryPlanner"})
+        except Exception as e:
+            report.append({**shape, "error": f"explain failed: {e}"})
+            continue
+
+        stages: List[str] = []
+        _plan_stages(explain, stages)
+        collection_scan = "COLLSCAN" in stages
+        in_memory_sort = "SORT" in stages or "$sort" in stages
+
+        query, _ = extract_query(shape["command"], command)
+        proposal = propose_index(shape, query) if (collection_scan or in_memory_sort) else None
+        if proposal:
+            proposal["collection"] = shape["collection"]
+            proposal["database"] = database
+        report.append({
+            **shape,
+            "plan_stages": stages,
+            "collection_scan": collection_scan,
+            "in_memory_sort": in_memory_sort,
+            "proposed_index": proposal
+        })
+    return report
+
+
+async def apply_index(client, proposal: Dict[str, Any]) -> str:
+    """Create a proposed index; returns its name"""
+    keys = [(field, direction) for field, direction in proposal["keys"]]
+    options: Dict[str, Any] = {}
+    if proposal.get("partial_filter"):
+        options["partialFilterExpression"] = proposal["partial_filter"]
+    collection = client[proposal["database"]][proposal["collection"]]
+    return await collection.create_index(keys, **options)
+
+
+# Global recorder, registered on the Motor client in database.py
+query_recorder = QueryShapeRecorder()
@@ -0,0 +1,225 @@
+# Backend/recommendations.py - "Also favorited" site neighbours from co-favorites
+
+import asyncio
+import heapq
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReplaceOne
+
+from models import CulturalSite, Favorite, SiteNeighbors
+from geo import haversine_km
+
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "20"))
+RECOMMENDATIONS_REBUILD_SECONDS = int(os.getenv("RECOMMENDATIONS_REBUILD_SECONDS", "3600"))
+# Only the most recent favorites of a user count; bounds the pairs generated per user
+RECOMMENDATIONS_MAX_USER_FAVORITES = int(os.getenv("RECOMMENDATIONS_MAX_USER_FAVORITES", "200"))
+# Distance at which a neighbour's score is halved by the nearby weighting
+RECOMMENDATIONS_DISTANCE_SCALE_KM = float(os.getenv("RECOMMENDATIONS_DISTANCE_SCALE_KM", "3"))
+
+# (site_id, score)
+Neighbor = Tuple[str, float]
+
+
+def compute_neighbors(user_sites: Iterable[Iterable[str]], top_k: int = RECOMMENDATIONS_TOP_K) -> Tuple[Dict[str, List[Neighbor]], Counter]:
+    """Top-k cosine neighbours of every site from the sparse user x site favorites matrix.
+
+    Co-occurrence counts (X^T X) are accumulated only for site pairs that share
+    a user, so the cost is proportional to the non-zero pairs, not sites^2.
+    """
+    item_counts: Counter = Counter()
+    co_counts: Dict[str, Counter] = defaultdict(Counter)
+    for sites in user_sites:
+        sites = sorted(set(sites))
+        item_counts.update(sites)
+        for i, a in enumerate(sites):
+            for b in sites[i + 1:]:
+                co_counts[a][b] += 1
+                co_counts[b][a] += 1
+
+    neighbors: Dict[str, List[Neighbor]] = {}
+    for a, row in co_counts.items():
+        norm_a = math.sqrt(item_counts[a])
+        scored = ((b, n / (norm_a * math.sqrt(item_counts[b]))) for b, n in row.items())
+        neighbors[a] = [(b, round(score, 6)) for b, score in heapq.nlargest(top_k, scored, key=lambda x: (x[1], x[0]))]
+    return neighbors, item_counts
+
+
+class SiteRecommender:
+    """Neighbour lists of all sites held in memory; rebuilt periodically from the favorites"""
+
+    def __init__(self, rebuild_interval: int = RECOMMENDATIONS_REBUILD_SECONDS):
+        self.rebuild_interval = rebuild_interval
+        self._neighbors: Dict[str, List[Neighbor]] = {}
+        self._locations: Dict[str, Tuple[float, float]] = {}  # site_id -> (lat, lng) of active sites
+        self._task: Optional[asyncio.Task] = None
+        self._rebuild_lock = asyncio.Lock()
+
+        self.loaded_at: Optional[datetime] = None
+        self.last_build_ms = 0.0
+        self.last_build_users = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def start(self):
+        """Start the periodic load/rebuild task (called from the app lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Another worker may have rebuilt recently; loading is much cheaper
+                newest = await SiteNeighbors.get_motor_collection().find_one(
+                    {}, {"updated_at": 1}, sort=[("updated_at", -1)]
+                )
+                fresh_after = datetime.utcnow() - timedelta(seconds=self.rebuild_interval)
+                if newest and newest["updated_at"] > fresh_after:
+                    await self.load()
+                else:
+                    await self.rebuild()
+            except Exception as e:
+                print(f"Failed to refresh site recommendations: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+    async def _load_locations(self):
+        cursor = CulturalSite.get_motor_collection().find({"is_active": True}, {"location": 1})
+        locations = {}
+        async for doc in cursor:
+            coordinates = (doc.get("location") or {}).get("coordinates") or []
+            if len(coordinates) == 2:
+                locations[str(doc["_id"])] = (coordinates[1], coordinates[0])
+        self._locations = locations
+
+    async def load(self):
+        """Load the stored neighbour lists"""
+        neighbors = {}
+        async for doc in SiteNeighbors.get_motor_collection().find({}, {"site_id": 1, "neighbors": 1}):
+            neighbors[doc["site_id"]] = [(n["site_id"], n["score"]) for n in doc.get("neighbors", [])]
+        await self._load_locations()
+        self._neighbors = neighbors
+        self.loaded_at = datetime.utcnow()
+
+    async def rebuild(self):
+        """Recompute all neighbour lists from the favorites and store them"""
+        # The periodic and the admin-triggered rebuild must not interleave their writes
+        async with self._rebuild_lock:
+            await self._rebuild()
+
+    async def _rebuild(self):
+        started = time.perf_counter()
+        await self._load_locations()
+
+        # Most recent favorites first, so truncation keeps the current taste of a user
+        user_sites: Dict[str, List[str]] = defaultdict(list)
+        cursor = Favorite.get_motor_collection().find(
+            {}, {"_id": 0, "user_id": 1, "site_id": 1}
+        ).sort([("user_id", 1), ("favorited_at", -1)])
+        async for doc in cursor:
+            sites = user_sites[doc["user_id"]]
+            if len(sites) < RECOMMENDATIONS_MAX_USER_FAVORITES and doc["site_id"] in self._locations:
+                sites.append(doc["site_id"])
+
+        # Pure-Python pair counting; off the event loop so requests keep being served
+        neighbors, item_counts = await asyncio.to_thread(compute_neighbors, list(user_sites.values()))
+
+        # Millisecond precision, as stored by MongoDB, for the stale-list cleanup below
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        collection = SiteNeighbors.get_motor_collection()
+        operations = [
+            ReplaceOne(
+                {"site_id": site_id},
+                {
+                    "site_id": site_id,
+                    "neighbors": [{"site_id": b, "score": score} for b, score in site_neighbors],
+                    "favorite_count": item_counts[site_id],
+                    "updated_at": now
+                },
+                upsert=True
+            )
+            for site_id, site_neighbors in neighbors.items()
+        ]
+        for i in range(0, len(operations), 1000):
+            await collection.bulk_write(operations[i:i + 1000], ordered=False)
+        await collection.delete_many({"updated_at": {"$lt": now}})
+
+        self._neighbors = neighbors
+        self.loaded_at = now
+        self.last_build_users = len(user_sites)
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+    def _weighted(self, candidates: Dict[str, float], lat: Optional[float], lng: Optional[float], limit: int) -> List[Dict]:
+        """Rank candidates by score, damped by distance from (lat, lng) when given"""
+        results = []
+        for site_id, score in candidates.items():
+            location = self._locations.get(site_id)
+            if location is None:
+                continue  # Deleted since the last build
+            distance_km = None
+            if lat is not None and lng is not None:
+                distance_km = haversine_km(lat, lng, location[0], location[1])
+                score = score / (1 + distance_km / RECOMMENDATIONS_DISTANCE_SCALE_KM)
+            results.append({"site_id": site_id, "score": round(score, 6), "distance_km": round(distance_km, 3) if distance_km is not None else None})
+        return heapq.nlargest(limit, results, key=lambda r: r["score"])
+
+    def similar(self, site_id: str, limit: int = 10, lat: Optional[float] = None, lng: Optional[float] = None) -> List[Dict]:
+        """Neighbours of a site, nearby-weighted around (lat, lng) or the site itself"""
+        if lat is None or lng is None:
+            lat, lng = self._locations.get(site_id, (None, None))
+        candidates = dict(self._neighbors.get(site_id, []))
+        return self._weighted(candidates, lat, lng, limit)
+
+    def feed(self, seed_site_ids: List[str], exclude: Iterable[str], limit: int = 20, lat: Optional[float] = None, lng: Optional[float] = None) -> List[Dict]:
+        """Sum of the neighbour scores of the seed sites, excluding sites the user already has"""
+        excluded = set(exclude) | set(seed_site_ids)
+        candidates: Dict[str, float] = defaultdict(float)
+        for seed in seed_site_ids:
+            for site_id, score in self._neighbors.get(seed, []):
+                if site_id not in excluded:
+                    candidates[site_id] += score
+        return self._weighted(candidates, lat, lng, limit)
+
+    def stats(self) -> Dict:
+        return {
+            "loaded_at": self.loaded_at,
+            "sites_with_neighbors": len(self._neighbors),
+            "active_sites": len(self._locations),
+            "last_build_users": self.last_build_users,
+            "last_build_ms": round(self.last_build_ms, 3),
+            "rebuild_interval_seconds": self.rebuild_interval
+        }
+
+
+# Global recommender, started in main.lifespan
+site_recommender = SiteRecommender()
+
+
+if __name__ == "__main__":
+    from database import init_database, close_database
+
+    async def main():
+        print("SITE RECOMMENDATIONS BUILD")
+        print("=" * 50)
+        await init_database()
+        await site_recommender.rebuild()
+        print(f"Neighbour lists: {len(site_recommender._neighbors)} sites from {site_recommender.last_build_users} users")
+        print(f"Build time: {site_recommender.last_build_ms:.0f} ms")
+        await close_database()
+
+    asyncio.run(main())
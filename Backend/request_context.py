@@ -0,0 +1,57 @@
+# Backend/request_context.py - Per-request context shared with code below the routers
+
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# ASGI scope of the request being handled. Motor copies the context into its
+# worker threads, so PyMongo command listeners can see it too.
+request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_scope", default=None)
+
+_templates: Dict[int, Dict[Any, str]] = {}
+
+
+def route_template(scope: Optional[Dict[str, Any]]) -> str:
+    """Path template of the matched route (e.g. /api/cultural-sites/{site_id})"""
+    if scope is None:
+        return "<background>"
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "<unmatched>"
+    app = scope.get("app")
+    templates = _templates.get(id(app))
+    if templates is None:
+        routes = getattr(getattr(app, "router", None), "routes", [])
+        templates = _templates[id(app)] = {route.endpoint: route.path for route in routes if hasattr(route, "endpoint")}
+    return templates.get(endpoint, "<unmatched>")
+
+
+def current_route() -> str:
+    """Route template of the current request, '<background>' outside requests"""
+    scope = request_scope.get()
+    return f"{scope['method']} {route_template(scope)}" if scope else "<background>"
+
+
+def bearer_token(scope: Dict[str, Any]) -> Optional[str]:
+    """Token from the request's "Authorization: Bearer ..." header"""
+    for key, value in scope.get("headers", []):
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token if scheme.lower() == "bearer" else None
+    return None
+
+
+class RequestContextMiddleware:
+    """Publishes the request scope through request_scope"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
@@ -0,0 +1,228 @@
+# Backend/rollups.py - Hourly/daily activity aggregates per site and per category
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from models import ActivityRollup, ActivityType, UserActivity
+
+GRANULARITIES = ("hour", "day")
+
+# Raw UserActivity documents older than this are purged (0 keeps them forever, the default).
+# Purging only starts once `python rollups.py` has backfilled the rollups for the existing history.
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "0"))
+ACTIVITY_RETENTION_CHECK_SECONDS = int(os.getenv("ACTIVITY_RETENTION_CHECK_SECONDS", "3600"))
+
+# Marker written by backfill_rollups; raw activities are never purged before it exists
+ROLLUP_MARKER_COLLECTION = "schema_meta"
+ROLLUP_MARKER_ID = "activity_rollups"
+# Backfill leaves the day containing (now - this) to the live rollups; must exceed
+# how long an activity can wait in the activity writer's queue
+ROLLUP_BACKFILL_SETTLE_SECONDS = int(os.getenv("ROLLUP_BACKFILL_SETTLE_SECONDS", "600"))
+
+# (site_id, category, activity_type, timestamp, count)
+RollupEntry = Tuple[str, Optional[str], str, datetime, int]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the hour/day bucket containing timestamp"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _value(value: Any) -> Optional[str]:
+    value = getattr(value, "value", value)
+    return str(value) if value is not None else None
+
+
+async def apply_rollups(entries: Iterable[RollupEntry]):
+    """Add activity counts to the rollups with one upserting bulk_write"""
+    increments: Dict[Tuple[str, str, str, datetime], Dict[str, Any]] = {}
+    for site_id, category, activity_type, timestamp, count in entries:
+        category = _value(category)
+        activity_type = _value(activity_type)
+        for granularity in GRANULARITIES:
+            start = bucket_start(timestamp, granularity)
+            scopes = [("site", site_id)]
+            if category:
+                scopes.append(("category", category))
+            for scope, key in scopes:
+                bucket = increments.setdefault((scope, granularity, key, start), {"category": category, "counts": {}})
+                bucket["counts"][activity_type] = bucket["counts"].get(activity_type, 0) + count
+
+    if not increments:
+        return
+    operations = [
+        UpdateOne(
+            {"scope": scope, "granularity": granularity, "key": key, "bucket_start": start},
+            {
+                "$inc": {f"counts.{activity_type}": n for activity_type, n in bucket["counts"].items()},
+                "$setOnInsert": {"category": bucket["category"]}
+            },
+            upsert=True
+        )
+        for (scope, granularity, key, start), bucket in increments.items()
+    ]
+    await ActivityRollup.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+async def record_activities(activities: List[UserActivity]):
+    """Roll up a batch of freshly written activities.
+
+    Sampled view records are skipped; exact view counts come from the view tracker.
+    """
+    await apply_rollups(
+        (a.site_id, (a.metadata or {}).get("site_category"), a.activity_type, a.timestamp, 1)
+        for a in activities
+        if not (a.metadata or {}).get("sampled")
+    )
+
+
+async def query_rollups(
+    scope: str,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    key: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Rollup buckets in [start, end), oldest first"""
+    query: Dict[str, Any] = {
+        "scope": scope,
+        "granularity": granularity,
+        "bucket_start": {"$gte": bucket_start(start, granularity), "$lt": end}
+    }
+    if key is not None:
+        query["key"] = key
+    docs = await ActivityRollup.get_motor_collection().find(
+        query, {"_id": 0, "key": 1, "category": 1, "bucket_start": 1, "counts": 1}
+    ).sort([("bucket_start", 1)]).to_list(None)
+    return docs
+
+
+def _marker_collection():
+    return ActivityRollup.get_motor_collection().database[ROLLUP_MARKER_COLLECTION]
+
+
+async def rollups_backfilled_at() -> Optional[datetime]:
+    """When backfill_rollups last completed (None = never; the raw history is not rolled up)"""
+    marker = await _marker_collection().find_one({"_id": ROLLUP_MARKER_ID})
+    return marker.get("backfilled_at") if marker else None
+
+
+class ActivityRetention:
+    """Periodically deletes raw activities older than the retention window"""
+
+    def __init__(self, retention_days: int = ACTIVITY_RETENTION_DAYS, interval: int = ACTIVITY_RETENTION_CHECK_SECONDS):
+        self.retention_days = retention_days
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_purged = 0
+        self.last_run: Optional[datetime] = None
+        self.blocked_reason: Optional[str] = None
+
+    def start(self):
+        if self.retention_days > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.purge()
+            except Exception as e:
+                print(f"Activity retention purge failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def purge(self) -> int:
+        """Delete raw activities past the retention window.
+
+        Refuses until backfill_rollups has run: activities from before the rollups
+        existed are only reflected in them after a backfill.
+        """
+        if await rollups_backfilled_at() is None:
+            self.blocked_reason = "Rollups have not been backfilled; run `python rollups.py` first"
+            self.last_run = datetime.utcnow()
+            print(f"Activity retention purge skipped: {self.blocked_reason}")
+            return 0
+        self.blocked_reason = None
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        result = await UserActivity.get_motor_collection().delete_many({"timestamp": {"$lt": cutoff}})
+        self.last_purged = result.deleted_count
+        self.last_run = datetime.utcnow()
+        return result.deleted_count
+
+
+# Global retention task, started in main.lifespan
+activity_retention = ActivityRetention()
+
+
+async def backfill_rollups(batch_size: int = 1000):
+    """Rebuild the non-view rollup counters from the raw activities still retained.
+
+    View counts are left alone: they come from the view tracker, not from the
+    (sampled) raw view records. After an earlier backfill (purges may have run
+    since), only the buckets from the day after the oldest retained activity
+    onward are rebuilt, so the rolled-up history of purged periods is kept.
+
+    Runs alongside the API: only whole days ending ROLLUP_BACKFILL_SETTLE_SECONDS
+    before the start are rebuilt, so the activity writer (which rolls up activities
+    as it writes them) never adds to a bucket that is being rebuilt. Activities of
+    the current day are left to the live rollups.
+    """
+    started_at = datetime.utcnow()
+    cutoff = bucket_start(started_at - timedelta(seconds=ROLLUP_BACKFILL_SETTLE_SECONDS), "day")
+    query: Dict[str, Any] = {"timestamp": {"$lt": cutoff}}
+    rollup_query: Dict[str, Any] = {"bucket_start": {"$lt": cutoff}}
+    if await rollups_backfilled_at() is not None:
+        oldest = await UserActivity.get_motor_collection().find_one({}, {"timestamp": 1}, sort=[("timestamp", 1)])
+        if oldest is None:
+            return 0  # Nothing retained to rebuild from
+        boundary = bucket_start(oldest["timestamp"], "day") + timedelta(days=1)
+        query["timestamp"]["$gte"] = boundary
+        rollup_query["bucket_start"]["$gte"] = boundary
+
+    # Clear the counters being rebuilt; the documents (and counts.view) stay
+    rebuilt_counts = {f"counts.{t.value}": "" for t in ActivityType if t != ActivityType.VIEW}
+    await ActivityRollup.get_motor_collection().update_many(rollup_query, {"$unset": rebuilt_counts})
+    batch: List[UserActivity] = []
+    total = 0
+    async for activity in UserActivity.find(query):
+        batch.append(activity)
+        if len(batch) >= batch_size:
+            await record_activities(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        await record_activities(batch)
+        total += len(batch)
+    await _marker_collection().update_one(
+        {"_id": ROLLUP_MARKER_ID},
+        {"$set": {"backfilled_at": started_at, "rebuilt_until": cutoff, "activities": total}},
+        upsert=True
+    )
+    return total
+
+if __name__ == "__main__":
+    from database import init_database, close_database
+
+    async def main():
+        print("ACTIVITY ROLLUP BACKFILL")
+        print("=" * 50)
+        await init_database()
+        total = await backfill_rollups()
+        print(f"Rolled up {total} activities")
+        await close_database()
+
+    asyncio.run(main())
@@ -0,0 +1,211 @@
+# Backend/routers/admin.py
+
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pydantic import BaseModel
+
+from models import User
+from auth import AuthenticatedUser, get_admin_user, principal_cache, password_hasher, token_revocations
+from database import db_manager
+from query_advisor import query_recorder, analyze, apply_index
+from activity_queue import activity_writer
+from view_tracker import view_tracker
+from recommendations import site_recommender
+from slow_queries import slow_query_log
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"]
+)
+
+class ApplyIndexesRequest(BaseModel):
+    shape_ids: Optional[List[str]] = None  # None = apply every proposal
+    min_count: int = 1
+
+class UserStatusUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+
+# --- Query shapes & index advice ---------------------------
+
+@router.get("/query-shapes")
+async def get_query_shapes(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Recorded MongoDB query shapes with call counts and timings"""
+    shapes = query_recorder.snapshot()
+    return {"shapes": shapes, "total": len(shapes), "dropped_shapes": query_recorder.dropped_shapes}
+
+
+@router.delete("/query-shapes")
+async def reset_query_shapes(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Clear the recorded query shapes"""
+    query_recorder.reset()
+    return {"message": "Query shapes cleared"}
+
+
+@router.get("/index-advice")
+async def get_index_advice(min_count: int = 1, current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Explain recorded shapes and propose compound/partial indexes for scans and in-memory sorts"""
+    try:
+        report = await analyze(db_manager.client, query_recorder, min_count=min_count)
+        return {
+            "shapes": report,
+            "collection_scans": sum(1 for r in report if r.get("collection_scan")),
+            "in_memory_sorts": sum(1 for r in report if r.get("in_memory_sort")),
+            "proposals": [dict(r["proposed_index"], shape_id=r["id"]) for r in report if r.get("proposed_index")]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build index advice: {str(e)}")
+
+
+@router.post("/index-advice/apply")
+async def apply_index_advice(request: ApplyIndexesRequest, current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Create the proposed indexes (all, or only those for the given shape ids)"""
+    try:
+        report = await analyze(db_manager.client, query_recorder, min_count=request.min_count)
+        created, failed, skipped = [], [], []
+        created_patterns = {}  # Several shapes can propose the same index
+        for entry in report:
+            proposal = entry.get("proposed_index")
+            if not proposal or (request.shape_ids is not None and entry["id"] not in request.shape_ids):
+                continue
+            pattern = (
+                proposal["database"], proposal["collection"],
+                tuple(tuple(key) for key in proposal["keys"]), repr(proposal.get("partial_filter"))
+            )
+            if pattern in created_patterns:
+                skipped.append({"shape_id": entry["id"], "collection": proposal["collection"], "index": created_patterns[pattern]})
+                continue
+            # One failing index (e.g. an option conflict) must not hide the ones already created
+            try:
+                name = await apply_index(db_manager.client, proposal)
+            except Exception as e:
+                failed.append({"shape_id": entry["id"], "collection": proposal["collection"], "keys": proposal["keys"], "error": str(e)})
+                continue
+            created_patterns[pattern] = name
+            created.append({"shape_id": entry["id"], "collection": proposal["collection"], "index": name})
+        return {
+            "message": f"Created {len(created)} indexes, {len(failed)} failed",
+            "created": created,
+            "failed": failed,
+            "skipped": skipped
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to apply indexes: {str(e)}")
+
+
+# --- Background pipelines -----------------------------------
+
+@router.get("/activity-queue")
+async def get_activity_queue_stats(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Activity write queue depth, throughput and flush latency"""
+    return activity_writer.stats()
+
+
+@router.get("/view-tracker")
+async def get_view_tracker_stats(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Pending and flushed view counts"""
+    return view_tracker.stats()
+
+
+@router.get("/recommendations")
+async def get_recommendations_stats(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Neighbour list coverage and last build time"""
+    return site_recommender.stats()
+
+
+@router.post("/recommendations/rebuild")
+async def rebuild_recommendations(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Recompute the neighbour lists now instead of waiting for the periodic job"""
+    try:
+        await site_recommender.rebuild()
+        return {"message": "Recommendations rebuilt", **site_recommender.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild recommendations: {str(e)}")
+
+
+# --- Users --------------------------------------------------
+
+@router.patch("/users/{user_id}")
+async def update_user_status(user_id: str, update: UserStatusUpdate, current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Activate/deactivate a user or change their admin role (takes effect immediately)"""
+    changes = update.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    if user_id == str(current_user.id) and (changes.get("is_active") is False or changes.get("is_admin") is False):
+        raise HTTPException(status_code=400, detail="You cannot deactivate or demote yourself")
+    try:
+        changes["updated_at"] = datetime.utcnow()
+        # A new security epoch invalidates every token issued with the old role/status
+        user_doc = await User.get_motor_collection().find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$set": changes, "$inc": {"security_epoch": 1}},
+            projection={"email": 1, "is_active": 1, "is_admin": 1, "security_epoch": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not user_doc:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal_cache.invalidate(user_id)
+        token_revocations.revoke(user_id, user_doc["security_epoch"])
+        return {
+            "message": "User updated",
+            "user_id": user_id,
+            "email": user_doc["email"],
+            "is_active": user_doc["is_active"],
+            "is_admin": user_doc["is_admin"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update user: {str(e)}")
+
+
+@router.get("/principal-cache")
+async def get_principal_cache_stats(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Authenticated-user cache size and hit ratio"""
+    return principal_cache.stats()
+
+
+@router.get("/password-hasher")
+async def get_password_hasher_stats(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """bcrypt worker pool load, rejections and rehash-on-login upgrades"""
+    return password_hasher.stats()
+
+
+@router.get("/token-revocations")
+async def get_token_revocation_stats(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Revoked users, epoch checks against the database and rejected tokens"""
+    return token_revocations.stats()
+
+
+# --- Slow queries -------------------------------------------
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = 100,
+    route: Optional[str] = None,
+    shape_id: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_admin_user)
+):
+    """Most recent MongoDB commands above the slow threshold, with shape, route and sampled explain"""
+    return {
+        **slow_query_log.stats(),
+        "entries": slow_query_log.entries(limit=limit, route=route, shape=shape_id)
+    }
+
+
+@router.get("/slow-queries/shapes")
+async def get_slow_query_shapes(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Buffered slow commands grouped by query shape and route"""
+    return {"shapes": slow_query_log.by_shape()}
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Clear the slow query buffer"""
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
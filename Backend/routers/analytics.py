@@ -0,0 +1,147 @@
+# Backend/routers/analytics.py
+
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta, timezone
+
+from models import CategoryType
+from auth import AuthenticatedUser, get_admin_user
+from rollups import GRANULARITIES, query_rollups, activity_retention
+
+router = APIRouter(
+    prefix="/api/analytics",
+    tags=["analytics"]
+)
+
+# Default windows when no start is given
+DEFAULT_WINDOWS = {"hour": timedelta(hours=48), "day": timedelta(days=7)}
+# Upper bound on buckets per request
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366 * 2}
+
+
+def _parse_iso(value: str) -> datetime:
+    """ISO date as naive UTC (rollup buckets are stored in naive UTC)"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_window(granularity: str, start: Optional[str], end: Optional[str]):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    try:
+        end_dt = _parse_iso(end) if end else datetime.utcnow()
+        start_dt = _parse_iso(start) if start else end_dt - DEFAULT_WINDOWS[granularity]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be ISO dates")
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    bucket = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    if (end_dt - start_dt) / bucket > MAX_BUCKETS[granularity]:
+        raise HTTPException(status_code=400, detail=f"Window too large for {granularity} granularity")
+    return start_dt, end_dt
+
+
+def _totals(buckets: List[Dict[str, Any]]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for bucket in buckets:
+        for activity_type, n in (bucket.get("counts") or {}).items():
+            totals[activity_type] = totals.get(activity_type, 0) + n
+    return totals
+
+
+@router.get("/sites/{site_id}")
+async def get_site_analytics(
+    site_id: str,
+    granularity: str = "day",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_admin_user)
+):
+    """Activity counts per hour/day bucket for one site"""
+    start_dt, end_dt = _parse_window(granularity, start, end)
+    try:
+        buckets = await query_rollups("site", granularity, start_dt, end_dt, key=site_id)
+        return {
+            "site_id": site_id,
+            "granularity": granularity,
+            "start": start_dt,
+            "end": end_dt,
+            "buckets": [{"bucket_start": b["bucket_start"], "counts": b.get("counts", {})} for b in buckets],
+            "totals": _totals(buckets)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get site analytics: {str(e)}")
+
+
+@router.get("/categories")
+async def get_category_analytics(
+    granularity: str = "day",
+    category: Optional[CategoryType] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_admin_user)
+):
+    """Activity counts per hour/day bucket for each category (or one category)"""
+    start_dt, end_dt = _parse_window(granularity, start, end)
+    try:
+        key = category.value if category else None
+        buckets = await query_rollups("category", granularity, start_dt, end_dt, key=key)
+
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for b in buckets:
+            by_category.setdefault(b["key"], []).append({"bucket_start": b["bucket_start"], "counts": b.get("counts", {})})
+
+        return {
+            "granularity": granularity,
+            "start": start_dt,
+            "end": end_dt,
+            "categories": {
+                name: {"buckets": entries, "totals": _totals(entries)}
+                for name, entries in by_category.items()
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get category analytics: {str(e)}")
+
+
+@router.get("/top-sites")
+async def get_top_sites(
+    activity_type: str = "view",
+    days: int = 7,
+    limit: int = 10,
+    current_user: AuthenticatedUser = Depends(get_admin_user)
+):
+    """Sites with the most activities of one type over the last days (daily rollups)"""
+    if days < 1 or days > MAX_BUCKETS["day"]:
+        raise HTTPException(status_code=400, detail="days out of range")
+    try:
+        end_dt = datetime.utcnow()
+        buckets = await query_rollups("site", "day", end_dt - timedelta(days=days), end_dt)
+
+        totals: Dict[str, Dict[str, Any]] = {}
+        for b in buckets:
+            n = (b.get("counts") or {}).get(activity_type, 0)
+            if not n:
+                continue
+            entry = totals.setdefault(b["key"], {"site_id": b["key"], "category": b.get("category"), "count": 0})
+            entry["count"] += n
+
+        top = sorted(totals.values(), key=lambda e: e["count"], reverse=True)[:limit]
+        return {"activity_type": activity_type, "days": days, "sites": top}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get top sites: {str(e)}")
+
+
+@router.get("/retention")
+async def get_retention_status(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    """Raw activity retention settings and the last purge"""
+    return {
+        "retention_days": activity_retention.retention_days,
+        "check_interval_seconds": activity_retention.interval,
+        "last_run": activity_retention.last_run,
+        "last_purged": activity_retention.last_purged,
+        "blocked_reason": activity_retention.blocked_reason
+    }
@@ -3,7 +3,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from datetime import timedelta, datetime
 
-from auth import AuthService, UserCreate, UserLogin, Token, UserResponse, get_current_user
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES, AuthService, UserCreate, UserLogin, Token, UserResponse, Principal, AuthenticatedUser, get_current_user, get_current_principal, principal_cache
 from models import User
 from pydantic import BaseModel
 
@@ -20,7 +20,7 @@ async def register_user(user_data: UserCreate):
         if existing_user:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-        hashed_password = AuthService.get_password_hash(user_data.password)
+        hashed_password = await AuthService.hash_password(user_data.password)
         user = User(
             email=user_data.email,
             password_hash=hashed_password,
@@ -31,11 +31,8 @@ async def register_user(user_data: UserCreate):
         )
         await user.save()
 
-        access_token_expires = timedelta(minutes=30)
-        access_token = AuthService.create_access_token(
-            data={"sub": str(user.id)},
-            expires_delta=access_token_expires
-        )
+        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = AuthService.create_user_token(user, expires_delta=access_token_expires)
 
         user_response = UserResponse(
             id=str(user.id),
@@ -65,7 +62,8 @@ async def login_user(user_credentials: UserLogin):
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        if not AuthService.verify_password(user_credentials.password, user.password_hash):
+        valid, new_hash = await AuthService.verify_password_and_update(user_credentials.password, user.password_hash)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -75,14 +73,16 @@ async def login_user(user_credentials: UserLogin):
         if not user.is_active:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
 
-        access_token_expires = timedelta(minutes=30)
-        access_token = AuthService.create_access_token(
-            data={"sub": str(user.id)},
-            expires_delta=access_token_expires
-        )
+        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = AuthService.create_user_token(user, expires_delta=access_token_expires)
 
         user.last_login = datetime.utcnow()
-        await user.save()
+        login_update = {"last_login": user.last_login}
+        if new_hash:
+            # Transparent upgrade to the current bcrypt cost
+            login_update["password_hash"] = new_hash
+        await user.set(login_update)
+        principal_cache.invalidate(str(user.id))
 
         user_response = UserResponse(
             id=str(user.id),
@@ -101,7 +101,7 @@ async def login_user(user_credentials: UserLogin):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Login failed: {str(e)}")
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: AuthenticatedUser = Depends(get_current_user)):
     """Get current user information"""
     return UserResponse(
         id=str(current_user.id),
@@ -119,7 +119,7 @@ async def logout_user():
     return {"message": "Successfully logged out"}
 
 @router.get("/protected")
-async def protected_route(current_user: User = Depends(get_current_user)):
+async def protected_route(current_user: Principal = Depends(get_current_principal)):
     """Example protected endpoint"""
     return {
         "message": f"Hello {current_user.first_name}! This is a protected route.",
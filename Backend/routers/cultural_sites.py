@@ -8,14 +8,25 @@ from datetime import datetime
 from bson import ObjectId
 
 # Import models & authentication dependency
-from models import CulturalSite, CategoryType, District, User
-from auth import get_current_user
+from models import CulturalSite, CategoryType, District
+from auth import Principal, AuthenticatedUser, get_current_principal, get_admin_user, get_optional_user_id, confirm_admin
+from summaries import site_facets, record_site_change
+from view_tracker import view_tracker
+from leaderboard import popularity_leaderboard
+from recommendations import site_recommender
 
 router = APIRouter(
     prefix="/api/cultural-sites",
     tags=["cultural_sites"]
 )
 
+# Maintained by atomic counter updates (favorites, views, reviews); edits must not overwrite them
+COUNTER_FIELDS = {"view_count", "favorite_count", "rating_sum", "rating_count", "rating_avg", "rating_histogram"}
+
+async def _save_site(cultural_site: CulturalSite):
+    """Write an edited site with $set instead of a full-document replace"""
+    await cultural_site.set(cultural_site.model_dump(exclude={"id", "revision_id", *COUNTER_FIELDS}))
+
 # --- Pydantic schemas for create/update ------------
 
 class CulturalSiteCreate(BaseModel):
@@ -117,23 +128,83 @@ async def get_cultural_sites(
 # --- GET /api/cultural-sites/{site_id} -----------------
 
 @router.get("/{site_id}")
-async def get_cultural_site_by_id(site_id: str):
-    """Get a specific cultural site by ID"""
+async def get_cultural_site_by_id(site_id: str, user_id: Optional[str] = Depends(get_optional_user_id)):
+    """Get a specific cultural site by ID (counts as a view)"""
     try:
         site = await CulturalSite.get(site_id)
         if not site:
             raise HTTPException(status_code=404, detail=f"Cultural site with ID '{site_id}' not found")
+        if site.is_active:
+            view_tracker.record(site_id, user_id=user_id, site_name=site.name, category=site.category)
         return site
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch cultural site: {str(e)}")
 
 
+# --- GET /api/cultural-sites/{site_id}/similar -----------
+
+@router.get("/{site_id}/similar")
+async def get_similar_sites(
+    site_id: str,
+    limit: int = Query(default=10, ge=1, le=50),
+    lat: Optional[float] = None,
+    lng: Optional[float] = None
+):
+    """Sites that users who favorited this site also favorited, weighted by proximity
+    to (lat, lng) or to the site itself"""
+    try:
+        ranked = site_recommender.similar(site_id, limit=limit, lat=lat, lng=lng)
+        if not ranked:
+            return {"site_id": site_id, "similar_sites": [], "total": 0}
+
+        sites = await CulturalSite.find(
+            {"_id": {"$in": [ObjectId(r["site_id"]) for r in ranked]}, "is_active": True}
+        ).to_list()
+        by_id = {str(site.id): site for site in sites}
+        similar_sites = [
+            {**by_id[r["site_id"]].model_dump(mode="json", by_alias=True), "similarity": r["score"], "distance_km": r["distance_km"]}
+            for r in ranked if r["site_id"] in by_id
+        ]
+        return {"site_id": site_id, "similar_sites": similar_sites, "total": len(similar_sites)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get similar sites: {str(e)}")
+
+
+# --- POST /api/cultural-sites/{site_id}/view (view beacon) -----
+
+@router.post("/{site_id}/view", status_code=status.HTTP_202_ACCEPTED)
+async def track_site_view(site_id: str, user_id: Optional[str] = Depends(get_optional_user_id)):
+    """Record a view for clients that render a site without fetching it (e.g. cached detail pages)"""
+    if not ObjectId.is_valid(site_id):
+        raise HTTPException(status_code=404, detail=f"Cultural site with ID '{site_id}' not found")
+
+    # Validated against the in-memory leaderboard so beacons cost no database read;
+    # while it is cold (failed warm-up), one projected lookup instead
+    if popularity_leaderboard.is_loaded:
+        category = popularity_leaderboard.category_of(site_id)
+        found = category is not None
+    else:
+        popularity_leaderboard.schedule_refresh()
+        doc = await CulturalSite.get_motor_collection().find_one(
+            {"_id": ObjectId(site_id), "is_active": True}, {"category": 1}
+        )
+        found = doc is not None
+        category = doc.get("category") if doc else None
+    if not found:
+        raise HTTPException(status_code=404, detail=f"Cultural site with ID '{site_id}' not found")
+
+    view_tracker.record(site_id, user_id=user_id, category=category)
+    return {"site_id": site_id, "status": "recorded"}
+
+
 # --- POST /api/cultural-sites (Create) -------------------
 
 @router.post("", response_model=dict)
 async def create_cultural_site(
     site_data: CulturalSiteCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new cultural site (authenticated users only)"""
     try:
@@ -157,6 +228,7 @@ async def create_cultural_site(
             }
         )
         await cultural_site.save()
+        await record_site_change(None, site_facets(cultural_site))
 
         return {
             "message": "Cultural site created successfully",
@@ -189,7 +261,7 @@ async def create_cultural_site(
 async def update_cultural_site(
     site_id: str,
     site_data: CulturalSiteUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update a cultural site (authenticated users only)"""
     try:
@@ -198,9 +270,10 @@ async def update_cultural_site(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cultural site not found")
 
         created_by = cultural_site.properties.get("created_by") if cultural_site.properties else None
-        if not current_user.is_admin and created_by != str(current_user.id):
+        if created_by != str(current_user.id) and not await confirm_admin(current_user):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only edit sites you created")
 
+        before = site_facets(cultural_site)
         update_data = site_data.dict(exclude_unset=True)
         for field, value in update_data.items():
             if field == "latitude":
@@ -222,7 +295,8 @@ async def update_cultural_site(
         cultural_site.properties["last_updated_by"] = str(current_user.id)
         cultural_site.properties["last_updated_by_name"] = f"{current_user.first_name} {current_user.last_name}"
 
-        await cultural_site.save()
+        await _save_site(cultural_site)
+        await record_site_change(before, site_facets(cultural_site))
         return {"message": "Cultural site updated successfully", "site_id": str(cultural_site.id), "updated_fields": list(update_data.keys())}
 
     except HTTPException:
@@ -239,7 +313,7 @@ async def update_cultural_site(
 @router.delete("/{site_id}")
 async def delete_cultural_site(
     site_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a cultural site (soft delete)"""
     try:
@@ -248,9 +322,10 @@ async def delete_cultural_site(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cultural site not found")
 
         created_by = cultural_site.properties.get("created_by") if cultural_site.properties else None
-        if not current_user.is_admin and created_by != str(current_user.id):
+        if created_by != str(current_user.id) and not await confirm_admin(current_user):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only delete sites you created")
 
+        before = site_facets(cultural_site)
         cultural_site.is_active = False
         cultural_site.updated_at = datetime.utcnow()
         if not cultural_site.properties:
@@ -259,7 +334,8 @@ async def delete_cultural_site(
         cultural_site.properties["deleted_by_name"] = f"{current_user.first_name} {current_user.last_name}"
         cultural_site.properties["deleted_at"] = datetime.utcnow().isoformat()
 
-        await cultural_site.save()
+        await _save_site(cultural_site)
+        await record_site_change(before, site_facets(cultural_site))
         return {"message": "Cultural site deleted successfully", "site_id": str(cultural_site.id), "deleted_by": f"{current_user.first_name} {current_user.last_name}"}
 
     except HTTPException:
@@ -276,17 +352,15 @@ async def delete_cultural_site(
 @router.patch("/{site_id}/restore")
 async def restore_cultural_site(
     site_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_admin_user)
 ):
     """Restore a deleted cultural site (admin only)"""
     try:
-        if not current_user.is_admin:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can restore deleted sites")
-
         cultural_site = await CulturalSite.get(site_id)
         if not cultural_site:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cultural site not found")
 
+        before = site_facets(cultural_site)
         cultural_site.is_active = True
         cultural_site.updated_at = datetime.utcnow()
         if not cultural_site.properties:
@@ -295,7 +369,8 @@ async def restore_cultural_site(
         cultural_site.properties["restored_by_name"] = f"{current_user.first_name} {current_user.last_name}"
         cultural_site.properties["restored_at"] = datetime.utcnow().isoformat()
 
-        await cultural_site.save()
+        await _save_site(cultural_site)
+        await record_site_change(before, site_facets(cultural_site))
         return {"message": "Cultural site restored successfully", "site_id": str(cultural_site.id), "restored_by": f"{current_user.first_name} {current_user.last_name}"}
 
     except HTTPException:
@@ -311,7 +386,7 @@ async def restore_cultural_site(
 
 @router.get("/my-sites")
 async def get_my_cultural_sites(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     include_deleted: bool = False
 ):
     """Get cultural sites created by the current user"""
@@ -1,19 +1,28 @@
 # Backend/routers/favorites.py
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from datetime import datetime
+import asyncio
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 
-from models import CulturalSite, User, UserActivity, ActivityType
+from models import CulturalSite, UserActivity, ActivityType, Favorite
 from pydantic import BaseModel
-from auth import get_current_user
+from auth import Principal, AuthenticatedUser, get_current_user, get_current_principal
+from leaderboard import popularity_leaderboard
+from activity_queue import activity_writer
+from recommendations import site_recommender
 
 router = APIRouter(
     prefix="/api/favorites",
     tags=["favorites"]
 )
 
+# Number of recent favorites that seed the recommendation feed
+RECOMMENDATIONS_FEED_SEEDS = 50
+
 class FavoriteResponse(BaseModel):
     site_id: str
     site_name: str
@@ -26,40 +35,180 @@ class UserFavoritesResponse(BaseModel):
     user_id: str
     favorites: List[FavoriteResponse]
     total_favorites: int
+    has_more: bool = False
+
+async def _get_site_summary(site_id: str) -> Optional[dict]:
+    """Fetch only the site fields the favorites routes need"""
+    if not ObjectId.is_valid(site_id):
+        return None
+    return await CulturalSite.get_motor_collection().find_one(
+        {"_id": ObjectId(site_id)},
+        {"name": 1, "category": 1, "is_active": 1}
+    )
+
+
+@router.post("/bulk")
+async def bulk_favorite_operations(operations: List[dict], current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Bulk add/remove favorites (one round trip per collection, not per operation)"""
+    try:
+        user_id = str(current_user.id)
+        favorites = Favorite.get_motor_collection()
+        sites_collection = CulturalSite.get_motor_collection()
+
+        requested_ids = list(dict.fromkeys(
+            op.get("site_id") for op in operations if isinstance(op.get("site_id"), str)
+        ))
+        object_ids = [ObjectId(sid) for sid in requested_ids if ObjectId.is_valid(sid)]
+
+        # Resolve all sites and the current favorite state in one query each
+        sites = {}
+        if object_ids:
+            site_docs = await sites_collection.find(
+                {"_id": {"$in": object_ids}}, {"name": 1, "category": 1, "is_active": 1}
+            ).to_list(None)
+            sites = {str(doc["_id"]): doc for doc in site_docs}
+        existing = set()
+        if requested_ids:
+            favorite_docs = await favorites.find(
+                {"user_id": user_id, "site_id": {"$in": requested_ids}}, {"site_id": 1}
+            ).to_list(None)
+            existing = {doc["site_id"] for doc in favorite_docs}
+
+        # Apply the operations in order against the in-memory favorite set
+        members = set(existing)
+        results = []
+        activities = []
+        for operation in operations:
+            action = operation.get("action")
+            site_id = operation.get("site_id")
+            if not action or not site_id:
+                results.append({"site_id": site_id, "action": action, "success": False, "error": "Missing action or site_id"})
+                continue
+
+            site = sites.get(site_id)
+            if action == "add":
+                if site_id in members:
+                    results.append({"site_id": site_id, "action": action, "success": False, "error": "Already in favorites"})
+                elif not site or not site.get("is_active", True):
+                    results.append({"site_id": site_id, "action": action, "success": False, "error": "Site not found or inactive"})
+                else:
+                    members.add(site_id)
+                    activities.append((site_id, ActivityType.FAVORITE))
+                    results.append({"site_id": site_id, "action": action, "success": True})
+            elif action == "remove":
+                if site_id in members:
+                    members.discard(site_id)
+                    activities.append((site_id, ActivityType.UNFAVORITE))
+                    results.append({"site_id": site_id, "action": action, "success": True})
+                else:
+                    results.append({"site_id": site_id, "action": action, "success": False, "error": "Not in favorites"})
+            else:
+                results.append({"site_id": site_id, "action": action, "success": False, "error": f"Unknown action '{action}'"})
+
+        intended = (members - existing) | (existing - members)
+        added = members - existing
+        removed = existing - members
+
+        # User-set changes: one insert_many and one delete_many
+        if added:
+            new_docs = [{"user_id": user_id, "site_id": sid, "favorited_at": datetime.utcnow()} for sid in added]
+            try:
+                await favorites.insert_many(new_docs, ordered=False)
+            except BulkWriteError as e:
+                # Pairs inserted concurrently by another request are already counted there
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+                for err in e.details.get("writeErrors", []):
+                    added.discard(new_docs[err["index"]]["site_id"])
+        if removed:
+            # Concurrent deletes, so we know exactly which rows this request removed
+            # (a concurrent request that removed the others decrements those itself)
+            removed_list = list(removed)
+            deleted = await asyncio.gather(*(
+                favorites.find_one_and_delete({"user_id": user_id, "site_id": sid}, projection={"_id": 1})
+                for sid in removed_list
+            ))
+            removed = {sid for sid, doc in zip(removed_list, deleted) if doc is not None}
+
+        # Sites whose change a concurrent request made first: report and log nothing for them
+        lost = intended - added - removed
+        if lost:
+            for result in results:
+                if result["success"] and result["site_id"] in lost:
+                    result["success"] = False
+                    result["error"] = "Already in favorites" if result["action"] == "add" else "Not in favorites"
+            activities = [(sid, activity_type) for sid, activity_type in activities if sid not in lost]
+
+        # Counter changes: one bulk_write, exactly +1 per inserted row and -1 per deleted row
+        counter_ops = [
+            UpdateOne({"_id": ObjectId(sid)}, {"$inc": {"favorite_count": 1}}) for sid in added
+        ] + [
+            UpdateOne({"_id": ObjectId(sid)}, {"$inc": {"favorite_count": -1}})
+            for sid in removed if ObjectId.is_valid(sid)
+        ]
+        if counter_ops:
+            await sites_collection.bulk_write(counter_ops, ordered=False)
+
+        for sid in added:
+            popularity_leaderboard.adjust(sid, favorites=1)
+        for sid in removed:
+            popularity_leaderboard.adjust(sid, favorites=-1)
+
+        # Activity log: written in batches by the background activity writer
+        for sid, activity_type in activities:
+            await activity_writer.enqueue(UserActivity(
+                user_id=user_id,
+                site_id=sid,
+                activity_type=activity_type,
+                metadata={"site_name": sites[sid]["name"], "site_category": sites[sid]["category"]} if sid in sites else {}
+            ))
+
+        successful_ops = sum(1 for r in results if r["success"])
+        total_favorites = await Favorite.find(Favorite.user_id == user_id).count()
+        return {"message": f"Bulk operation completed: {successful_ops}/{len(operations)} successful", "results": results, "total_favorites": total_favorites}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk operation failed: {str(e)}")
+
 
 @router.post("/{site_id}")
-async def add_to_favorites(site_id: str, current_user: User = Depends(get_current_user)):
+async def add_to_favorites(site_id: str, current_user: AuthenticatedUser = Depends(get_current_user)):
     """Add a cultural site to user's favorites"""
     try:
-        site = await CulturalSite.get(site_id)
+        site = await _get_site_summary(site_id)
         if not site:
             raise HTTPException(status_code=404, detail="Cultural site not found")
-        if not site.is_active:
+        if not site.get("is_active", True):
             raise HTTPException(status_code=400, detail="Cannot favorite inactive site")
-        if site_id in current_user.favorite_sites:
-            raise HTTPException(status_code=400, detail="Site already in favorites")
 
-        current_user.favorite_sites.append(site_id)
-        current_user.updated_at = datetime.utcnow()
-        await current_user.save()
+        # The unique (user_id, site_id) index makes concurrent adds insert only once
+        try:
+            await Favorite(user_id=str(current_user.id), site_id=site_id).insert()
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Site already in favorites")
 
-        site.favorite_count += 1
-        await site.save()
+        site_doc = await CulturalSite.get_motor_collection().find_one_and_update(
+            {"_id": site["_id"]},
+            {"$inc": {"favorite_count": 1}},
+            projection={"favorite_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        popularity_leaderboard.adjust(site_id, favorites=1)
 
         activity = UserActivity(
             user_id=str(current_user.id),
             site_id=site_id,
             activity_type=ActivityType.FAVORITE,
-            metadata={"site_name": site.name, "site_category": site.category}
+            metadata={"site_name": site["name"], "site_category": site["category"]}
         )
-        await activity.save()
+        await activity_writer.enqueue(activity)
 
         return {
             "message": "Site added to favorites",
             "site_id": site_id,
-            "site_name": site.name,
-            "total_favorites": len(current_user.favorite_sites),
-            "site_favorite_count": site.favorite_count
+            "site_name": site["name"],
+            "total_favorites": await Favorite.find(Favorite.user_id == str(current_user.id)).count(),
+            "site_favorite_count": site_doc["favorite_count"] if site_doc else 0
         }
     except HTTPException:
         raise
@@ -68,37 +217,44 @@ async def add_to_favorites(site_id: str, current_user: User = Depends(get_curren
 
 
 @router.delete("/{site_id}")
-async def remove_from_favorites(site_id: str, current_user: User = Depends(get_current_user)):
+async def remove_from_favorites(site_id: str, current_user: AuthenticatedUser = Depends(get_current_user)):
     """Remove a cultural site from user's favorites"""
     try:
-        site = await CulturalSite.get(site_id)
+        site = await _get_site_summary(site_id)
         if not site:
             raise HTTPException(status_code=404, detail="Cultural site not found")
-        if site_id not in current_user.favorite_sites:
-            raise HTTPException(status_code=400, detail="Site not in favorites")
 
-        current_user.favorite_sites.remove(site_id)
-        current_user.updated_at = datetime.utcnow()
-        await current_user.save()
+        result = await Favorite.get_motor_collection().delete_one(
+            {"user_id": str(current_user.id), "site_id": site_id}
+        )
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=400, detail="Site not in favorites")
 
-        if site.favorite_count > 0:
-            site.favorite_count -= 1
-            await site.save()
+        # Only decrement when the favorite was actually deleted. No ">0" guard: a concurrent add
+        # may have inserted its row but not yet incremented, and skipping our -1 would leave the
+        # counter one above the row count once that increment lands.
+        site_doc = await CulturalSite.get_motor_collection().find_one_and_update(
+            {"_id": site["_id"]},
+            {"$inc": {"favorite_count": -1}},
+            projection={"favorite_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        popularity_leaderboard.adjust(site_id, favorites=-1)
 
         activity = UserActivity(
             user_id=str(current_user.id),
             site_id=site_id,
             activity_type=ActivityType.UNFAVORITE,
-            metadata={"site_name": site.name, "site_category": site.category}
+            metadata={"site_name": site["name"], "site_category": site["category"]}
         )
-        await activity.save()
+        await activity_writer.enqueue(activity)
 
         return {
             "message": "Site removed from favorites",
             "site_id": site_id,
-            "site_name": site.name,
-            "total_favorites": len(current_user.favorite_sites),
-            "site_favorite_count": site.favorite_count
+            "site_name": site["name"],
+            "total_favorites": await Favorite.find(Favorite.user_id == str(current_user.id)).count(),
+            "site_favorite_count": max(0, site_doc["favorite_count"]) if site_doc else 0
         }
     except HTTPException:
         raise
@@ -107,113 +263,103 @@ async def remove_from_favorites(site_id: str, current_user: User = Depends(get_c
 
 
 @router.get("", response_model=UserFavoritesResponse)
-async def get_user_favorites(current_user: User = Depends(get_current_user), include_inactive: bool = False):
-    """Get user's favorite cultural sites"""
+async def get_user_favorites(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    include_inactive: bool = False,
+    limit: int = Query(default=50, ge=1, le=500),
+    skip: int = Query(default=0, ge=0)
+):
+    """Get user's favorite cultural sites, most recently favorited first"""
     try:
-        if not current_user.favorite_sites:
-            return UserFavoritesResponse(user_id=str(current_user.id), favorites=[], total_favorites=0)
+        user_id = str(current_user.id)
+        total_favorites = await Favorite.find(Favorite.user_id == user_id).count()
 
-        valid_object_ids = []
-        for sid in current_user.favorite_sites:
-            if ObjectId.is_valid(sid):
-                valid_object_ids.append(ObjectId(sid))
+        # Served by the (user_id, favorited_at) index
+        page = await Favorite.find(Favorite.user_id == user_id).sort(
+            [("favorited_at", -1)]
+        ).skip(skip).limit(limit).to_list()
 
+        valid_object_ids = [ObjectId(fav.site_id) for fav in page if ObjectId.is_valid(fav.site_id)]
         if not valid_object_ids:
-            return UserFavoritesResponse(user_id=str(current_user.id), favorites=[], total_favorites=0)
+            return UserFavoritesResponse(user_id=user_id, favorites=[], total_favorites=total_favorites)
 
         query = {"_id": {"$in": valid_object_ids}}
         if not include_inactive:
             query["is_active"] = True
 
-        favorite_sites = await CulturalSite.find(query).to_list()
-        activities = await UserActivity.find({
-            "user_id": str(current_user.id),
-            "activity_type": ActivityType.FAVORITE,
-            "site_id": {"$in": current_user.favorite_sites}
-        }).sort([("timestamp", -1)]).to_list()
-
-        activity_lookup = {activity.site_id: activity.timestamp for activity in activities}
+        sites = {str(site.id): site for site in await CulturalSite.find(query).to_list()}
         favorites = []
-        for site in favorite_sites:
-            fav = FavoriteResponse(
-                site_id=str(site.id),
+        for fav in page:
+            site = sites.get(fav.site_id)
+            if site is None:
+                continue
+            favorites.append(FavoriteResponse(
+                site_id=fav.site_id,
                 site_name=site.name,
                 site_category=site.category,
                 site_address=site.address,
-                favorited_at=activity_lookup.get(str(site.id), site.created_at)
-            )
-            favorites.append(fav)
-
-        favorites.sort(key=lambda x: x.favorited_at, reverse=True)
-        return UserFavoritesResponse(user_id=str(current_user.id), favorites=favorites, total_favorites=len(favorites))
+                favorited_at=fav.favorited_at
+            ))
+
+        return UserFavoritesResponse(
+            user_id=user_id,
+            favorites=favorites,
+            total_favorites=total_favorites,
+            has_more=total_favorites > skip + len(page)
+        )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get favorites: {str(e)}")
 
 
-@router.get("/check/{site_id}")
-async def check_favorite_status(site_id: str, current_user: User = Depends(get_current_user)):
-    """Check if a site is in user's favorites"""
+@router.get("/recommendations")
+async def get_recommendations(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    limit: int = Query(default=20, ge=1, le=100),
+    lat: Optional[float] = None,
+    lng: Optional[float] = None
+):
+    """Personal feed: neighbours of the user's recent favorites, weighted by proximity to (lat, lng)"""
     try:
-        is_favorite = site_id in current_user.favorite_sites
-        return {"site_id": site_id, "is_favorite": is_favorite, "user_id": str(current_user.id)}
+        user_id = str(current_user.id)
+        # The most recent favorites seed the feed (served by the (user_id, favorited_at) index)
+        seeds = await Favorite.get_motor_collection().find(
+            {"user_id": user_id}, {"_id": 0, "site_id": 1}
+        ).sort([("favorited_at", -1)]).limit(RECOMMENDATIONS_FEED_SEEDS).to_list(None)
+        seed_ids = [doc["site_id"] for doc in seeds]
+
+        # Over-fetch so that older favorites outside the seeds can be removed
+        ranked = site_recommender.feed(seed_ids, exclude=[], limit=limit * 2, lat=lat, lng=lng)
+        if ranked:
+            already = await Favorite.get_motor_collection().find(
+                {"user_id": user_id, "site_id": {"$in": [r["site_id"] for r in ranked]}}, {"_id": 0, "site_id": 1}
+            ).to_list(None)
+            already_ids = {doc["site_id"] for doc in already}
+            ranked = [r for r in ranked if r["site_id"] not in already_ids][:limit]
+
+        if not ranked:
+            return {"user_id": user_id, "recommendations": [], "total": 0, "based_on": len(seed_ids)}
+
+        sites = await CulturalSite.find(
+            {"_id": {"$in": [ObjectId(r["site_id"]) for r in ranked]}, "is_active": True}
+        ).to_list()
+        by_id = {str(site.id): site for site in sites}
+        recommendations = [
+            {**by_id[r["site_id"]].model_dump(mode="json", by_alias=True), "score": r["score"], "distance_km": r["distance_km"]}
+            for r in ranked if r["site_id"] in by_id
+        ]
+        return {"user_id": user_id, "recommendations": recommendations, "total": len(recommendations), "based_on": len(seed_ids)}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to check favorite status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
 
 
-@router.post("/bulk")
-async def bulk_favorite_operations(operations: List[dict], current_user: User = Depends(get_current_user)):
-    """Bulk add/remove favorites"""
+@router.get("/check/{site_id}")
+async def check_favorite_status(site_id: str, current_user: Principal = Depends(get_current_principal)):
+    """Check if a site is in user's favorites"""
     try:
-        results = []
-        for operation in operations:
-            action = operation.get("action")
-            site_id = operation.get("site_id")
-            if not action or not site_id:
-                results.append({"site_id": site_id, "action": action, "success": False, "error": "Missing action or site_id"})
-                continue
-
-            try:
-                if action == "add":
-                    if site_id not in current_user.favorite_sites:
-                        site = await CulturalSite.get(site_id)
-                        if site and site.is_active:
-                            current_user.favorite_sites.append(site_id)
-                            site.favorite_count += 1
-                            await site.save()
-
-                            activity = UserActivity(user_id=str(current_user.id), site_id=site_id, activity_type=ActivityType.FAVORITE)
-                            await activity.save()
-
-                            results.append({"site_id": site_id, "action": action, "success": True})
-                        else:
-                            results.append({"site_id": site_id, "action": action, "success": False, "error": "Site not found or inactive"})
-                    else:
-                        results.append({"site_id": site_id, "action": action, "success": False, "error": "Already in favorites"})
-
-                elif action == "remove":
-                    if site_id in current_user.favorite_sites:
-                        current_user.favorite_sites.remove(site_id)
-
-                        site = await CulturalSite.get(site_id)
-                        if site and site.favorite_count > 0:
-                            site.favorite_count -= 1
-                            await site.save()
-
-                        activity = UserActivity(user_id=str(current_user.id), site_id=site_id, activity_type=ActivityType.UNFAVORITE)
-                        await activity.save()
-
-                        results.append({"site_id": site_id, "action": action, "success": True})
-                    else:
-                        results.append({"site_id": site_id, "action": action, "success": False, "error": "Not in favorites"})
-            except Exception as e:
-                results.append({"site_id": site_id, "action": action, "success": False, "error": str(e)})
-
-        current_user.updated_at = datetime.utcnow()
-        await current_user.save()
-
-        successful_ops = sum(1 for r in results if r["success"])
-        return {"message": f"Bulk operation completed: {successful_ops}/{len(operations)} successful", "results": results, "total_favorites": len(current_user.favorite_sites)}
-
+        favorite = await Favorite.get_motor_collection().find_one(
+            {"user_id": str(current_user.id), "site_id": site_id}, {"_id": 1}
+        )
+        return {"site_id": site_id, "is_favorite": favorite is not None, "user_id": str(current_user.id)}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Bulk operation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to check favorite status: {str(e)}")
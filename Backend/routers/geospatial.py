@@ -6,7 +6,7 @@ from datetime import datetime
 import math
 from bson import ObjectId
 
-from models import CulturalSite, CategoryType, District
+from models import CulturalSite, CategoryType, District, GERMAN_COLLATION
 
 from pydantic import BaseModel
 
@@ -79,7 +79,8 @@ async def proximity_search(
             pipeline.append({"$sort": {"distance": 1}})
         pipeline.append({"$limit": max_results})
 
-        results = await CulturalSite.aggregate(pipeline).to_list()
+        aggregate_options = {"collation": GERMAN_COLLATION} if sort_by == "name" else {}
+        results = await CulturalSite.aggregate(pipeline, **aggregate_options).to_list()
 
         proximity_sites: List[ProximitySite] = []
         for result in results:
@@ -316,7 +317,8 @@ async def get_sites_within_district(
         else:
             sort_criteria = [("created_at", -1)]
 
-        sites = await CulturalSite.find(query).sort(sort_criteria).limit(limit).to_list()
+        find_options = {"collation": GERMAN_COLLATION} if sort_by in ("name", "category") else {}
+        sites = await CulturalSite.find(query, **find_options).sort(sort_criteria).limit(limit).to_list()
 
         category_breakdown = {}
         for s in sites:
@@ -0,0 +1,111 @@
+# Backend/routers/me.py
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+import base64
+from bson import ObjectId
+
+from models import UserActivity, ActivityType
+from auth import AuthenticatedUser, get_current_user
+from site_names import site_name_cache
+
+router = APIRouter(
+    prefix="/api/me",
+    tags=["me"]
+)
+
+# --- Keyset cursors ---------------------------------------
+
+def _encode_cursor(timestamp: datetime, activity_id: ObjectId) -> str:
+    raw = f"{timestamp.isoformat()}|{activity_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        timestamp, activity_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(activity_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_date(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date")
+    # Activity timestamps are stored in naive UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+# --- GET /api/me/activity ---------------------------------
+
+@router.get("/activity")
+async def get_my_activity(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    activity_type: Optional[ActivityType] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200)
+):
+    """Your activity history, newest first.
+
+    Pass next_cursor from the previous page as cursor; served by the
+    (user_id, timestamp, _id) index without skip or in-memory sorts.
+    """
+    start_dt = _parse_date(start, "start")
+    end_dt = _parse_date(end, "end")
+    try:
+        query: Dict[str, Any] = {"user_id": str(current_user.id)}
+        time_range: Dict[str, Any] = {}
+        if start_dt:
+            time_range["$gte"] = start_dt
+        if end_dt:
+            time_range["$lt"] = end_dt
+        if cursor:
+            after_ts, after_id = _decode_cursor(cursor)
+            # Strictly after the last row of the previous page in (timestamp, _id) order;
+            # the $lte keeps the index scan bounded, the $or breaks timestamp ties
+            time_range["$lte"] = after_ts
+            query["$or"] = [{"timestamp": {"$lt": after_ts}}, {"_id": {"$lt": after_id}}]
+        if time_range:
+            query["timestamp"] = time_range
+        if activity_type:
+            query["activity_type"] = activity_type.value
+
+        docs = await UserActivity.get_motor_collection().find(query).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(None)
+        has_more = len(docs) > limit
+        docs = docs[:limit]
+
+        names = await site_name_cache.lookup(doc["site_id"] for doc in docs)
+        items = []
+        for doc in docs:
+            metadata = doc.get("metadata") or {}
+            site = names.get(doc["site_id"]) or {}
+            items.append({
+                "id": str(doc["_id"]),
+                "activity_type": doc["activity_type"],
+                "timestamp": doc["timestamp"],
+                "site_id": doc["site_id"],
+                "site_name": site.get("name") or metadata.get("site_name"),
+                "site_category": site.get("category") or metadata.get("site_category"),
+                "metadata": metadata
+            })
+
+        return {
+            "activities": items,
+            "total": len(items),
+            "has_more": has_more,
+            "next_cursor": _encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"]) if has_more else None
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get activity history: {str(e)}")
@@ -0,0 +1,246 @@
+# Backend/routers/reviews.py
+
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models import CulturalSite, CategoryType, Review, UserActivity, ActivityType
+from auth import AuthenticatedUser, get_current_user
+from activity_queue import activity_writer
+
+router = APIRouter(
+    prefix="/api/reviews",
+    tags=["reviews"]
+)
+
+# --- Pydantic schemas ------------------------------------
+
+class ReviewCreate(BaseModel):
+    site_id: str
+    rating: int = Field(..., ge=1, le=5)
+    title: Optional[str] = None
+    comment: Optional[str] = None
+    visit_date: Optional[datetime] = None
+
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = Field(default=None, ge=1, le=5)
+    title: Optional[str] = None
+    comment: Optional[str] = None
+    visit_date: Optional[datetime] = None
+
+# --- Rating aggregates -----------------------------------
+
+RATING_FIELDS = {"rating_sum": 1, "rating_count": 1, "rating_avg": 1, "rating_histogram": 1}
+
+
+def _rating_pipeline(added: Optional[int], removed: Optional[int]) -> List[Dict[str, Any]]:
+    """Update pipeline that adds/removes one rating and recomputes the average in the same write"""
+    counters: Dict[str, Any] = {
+        "rating_sum": {"$add": [{"$ifNull": ["$rating_sum", 0]}, (added or 0) - (removed or 0)]},
+        "rating_count": {"$add": [{"$ifNull": ["$rating_count", 0]}, (1 if added else 0) - (1 if removed else 0)]}
+    }
+    for rating, delta in ((added, 1), (removed, -1)):
+        if rating:
+            field = f"rating_histogram.{rating}"
+            counters[field] = {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}
+    return [
+        {"$set": counters},
+        {"$set": {"rating_avg": {"$cond": [
+            {"$gt": ["$rating_count", 0]},
+            {"$round": [{"$divide": ["$rating_sum", "$rating_count"]}, 3]},
+            0.0
+        ]}}}
+    ]
+
+
+async def _apply_rating_change(site_id: str, added: Optional[int] = None, removed: Optional[int] = None) -> Optional[dict]:
+    """Atomically apply a rating change to the site; returns the new aggregates"""
+    if added == removed or not ObjectId.is_valid(site_id):
+        return None
+    return await CulturalSite.get_motor_collection().find_one_and_update(
+        {"_id": ObjectId(site_id)},
+        _rating_pipeline(added, removed),
+        projection=RATING_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _rating_summary(doc: Optional[dict]) -> Dict[str, Any]:
+    doc = doc or {}
+    histogram = doc.get("rating_histogram") or {}
+    return {
+        "average": doc.get("rating_avg", 0.0),
+        "count": doc.get("rating_count", 0),
+        "histogram": {str(r): histogram.get(str(r), 0) for r in range(1, 6)}
+    }
+
+# --- POST /api/reviews -----------------------------------
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+async def create_review(review_data: ReviewCreate, current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Review a cultural site (one review per user and site)"""
+    try:
+        user_id = str(current_user.id)
+        if not ObjectId.is_valid(review_data.site_id):
+            raise HTTPException(status_code=404, detail="Cultural site not found")
+        site = await CulturalSite.get_motor_collection().find_one(
+            {"_id": ObjectId(review_data.site_id), "is_active": True}, {"name": 1, "category": 1}
+        )
+        if not site:
+            raise HTTPException(status_code=404, detail="Cultural site not found")
+
+        review = Review(user_id=user_id, **review_data.model_dump())
+        try:
+            await review.insert()
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="You have already reviewed this site")
+
+        aggregates = await _apply_rating_change(review.site_id, added=review.rating)
+
+        await activity_writer.enqueue(UserActivity(
+            user_id=user_id,
+            site_id=review.site_id,
+            activity_type=ActivityType.REVIEW,
+            metadata={"site_name": site["name"], "site_category": site["category"], "rating": review.rating}
+        ))
+
+        return {"message": "Review created", "review": review, "site_rating": _rating_summary(aggregates)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create review: {str(e)}")
+
+# --- GET /api/reviews/top-rated --------------------------
+
+@router.get("/top-rated")
+async def get_top_rated_sites(
+    category: Optional[CategoryType] = None,
+    min_reviews: int = Query(default=1, ge=1),
+    limit: int = Query(default=10, ge=1, le=100)
+):
+    """Best rated active sites, served by the (is_active, [category,] rating_avg, rating_count) indexes"""
+    try:
+        query: Dict[str, Any] = {"is_active": True, "rating_count": {"$gte": min_reviews}}
+        if category:
+            query["category"] = category
+
+        sites = await CulturalSite.find(query).sort([
+            ("rating_avg", -1),
+            ("rating_count", -1)
+        ]).limit(limit).to_list()
+        return {"sites": sites, "total": len(sites), "category": category, "min_reviews": min_reviews}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get top rated sites: {str(e)}")
+
+# --- GET /api/reviews/me ---------------------------------
+
+@router.get("/me")
+async def get_my_reviews(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    limit: int = Query(default=50, ge=1, le=200),
+    skip: int = Query(default=0, ge=0)
+):
+    """Reviews written by the current user, newest first"""
+    try:
+        user_id = str(current_user.id)
+        reviews = await Review.find(Review.user_id == user_id).sort(
+            [("created_at", -1)]
+        ).skip(skip).limit(limit).to_list()
+        total = await Review.find(Review.user_id == user_id).count()
+        return {"reviews": reviews, "total": total, "has_more": skip + len(reviews) < total}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get reviews: {str(e)}")
+
+# --- GET /api/reviews/site/{site_id} ---------------------
+
+@router.get("/site/{site_id}")
+async def get_site_reviews(
+    site_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    skip: int = Query(default=0, ge=0)
+):
+    """Reviews of a site, newest first, with the precomputed rating summary"""
+    try:
+        if not ObjectId.is_valid(site_id):
+            raise HTTPException(status_code=404, detail="Cultural site not found")
+        aggregates = await CulturalSite.get_motor_collection().find_one({"_id": ObjectId(site_id)}, RATING_FIELDS)
+        if not aggregates:
+            raise HTTPException(status_code=404, detail="Cultural site not found")
+
+        reviews = await Review.find({"site_id": site_id, "is_active": True}).sort(
+            [("created_at", -1)]
+        ).skip(skip).limit(limit).to_list()
+        summary = _rating_summary(aggregates)
+        return {
+            "site_id": site_id,
+            "rating": summary,
+            "reviews": reviews,
+            "pagination": {"limit": limit, "skip": skip, "has_more": summary["count"] > skip + len(reviews)}
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get site reviews: {str(e)}")
+
+# --- PUT /api/reviews/{review_id} ------------------------
+
+@router.put("/{review_id}")
+async def update_review(review_id: str, review_data: ReviewUpdate, current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Update your own review"""
+    try:
+        if not ObjectId.is_valid(review_id):
+            raise HTTPException(status_code=404, detail="Review not found")
+        update = review_data.model_dump(exclude_unset=True)
+        if update.get("rating") is None:
+            update.pop("rating", None)
+        update["updated_at"] = datetime.utcnow()
+
+        # Returns the previous version so the old rating can be taken out of the aggregates
+        previous = await Review.get_motor_collection().find_one_and_update(
+            {"_id": ObjectId(review_id), "user_id": str(current_user.id)},
+            {"$set": update},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not previous:
+            raise HTTPException(status_code=404, detail="Review not found")
+
+        aggregates = None
+        if previous.get("is_active", True) and "rating" in update:
+            aggregates = await _apply_rating_change(previous["site_id"], added=update["rating"], removed=previous["rating"])
+
+        review = await Review.get(review_id)
+        return {"message": "Review updated", "review": review, "site_rating": _rating_summary(aggregates) if aggregates else None}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update review: {str(e)}")
+
+# --- DELETE /api/reviews/{review_id} ---------------------
+
+@router.delete("/{review_id}")
+async def delete_review(review_id: str, current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Delete your own review (admins can delete any review)"""
+    try:
+        if not ObjectId.is_valid(review_id):
+            raise HTTPException(status_code=404, detail="Review not found")
+        query: Dict[str, Any] = {"_id": ObjectId(review_id)}
+        if not current_user.is_admin:
+            query["user_id"] = str(current_user.id)
+
+        deleted = await Review.get_motor_collection().find_one_and_delete(query)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Review not found")
+
+        aggregates = None
+        if deleted.get("is_active", True):
+            aggregates = await _apply_rating_change(deleted["site_id"], removed=deleted["rating"])
+
+        return {"message": "Review deleted", "review_id": review_id, "site_rating": _rating_summary(aggregates) if aggregates else None}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete review: {str(e)}")
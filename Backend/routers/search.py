@@ -3,13 +3,21 @@
 from fastapi import APIRouter, HTTPException
 from typing import Optional, List
 from datetime import datetime
-from models import CulturalSite, CategoryType, District, UserActivity
+from bson import ObjectId
+from models import CulturalSite, CategoryType, District, UserActivity, GERMAN_COLLATION
+from summaries import filter_values_summary
+from leaderboard import popularity_leaderboard
+from trending import trending_sites
+from search_cache import search_cache, canonical_key, snap_to_grid
 
 router = APIRouter(
     prefix="/api/search",
     tags=["search"]
 )
 
+# Largest /trending radius; the in-memory scan grows with the area covered
+TRENDING_MAX_RADIUS_METERS = 25000
+
 @router.get("/advanced")
 async def advanced_search(
     q: Optional[str] = None,
@@ -21,6 +29,7 @@ async def advanced_search(
     has_opening_hours: Optional[bool] = None,
     created_after: Optional[str] = None,
     created_before: Optional[str] = None,
+    min_rating: Optional[float] = None,
     sort_by: Optional[str] = "name",
     sort_order: Optional[str] = "asc",
     limit: int = 100,
@@ -28,54 +37,83 @@ async def advanced_search(
 ):
     """Advanced search with multiple filters and sorting"""
     try:
-        query = {"is_active": True}
-
-        if q:
-    # Use regex for more precise matching
-            query["$or"] = [
-        {"name": {"$regex": q, "$options": "i"}},  # Case-insensitive name search
-        {"description": {"$regex": q, "$options": "i"}},  # Description search
-        {"address": {"$regex": q, "$options": "i"}}  # Address search
-    ]
-        if category:
-            query["category"] = category
-        if source:
-            query["source"] = source
-
-        if district:
-            district_doc = await District.find_one({"properties.STADTTNAME": district})
-            if district_doc:
-                query["location"] = {"$geoWithin": {"$geometry": district_doc.geometry}}
-
-        if has_website is not None:
-            if has_website:
-                query["website"] = {"$ne": None}
-            else:
-                query["$or"] = [{"website": None}, {"website": ""}]
-        if has_phone is not None:
-            if has_phone:
-                query["phone"] = {"$ne": None}
-            else:
-                query["$or"] = [{"phone": None}, {"phone": ""}]
-        if has_opening_hours is not None:
-            if has_opening_hours:
-                query["opening_hours"] = {"$ne": None}
-            else:
-                query["$or"] = [{"opening_hours": None}, {"opening_hours": ""}]
+        async def run_search():
+            query = {"is_active": True}
+
+            if q:
+                # Use regex for more precise matching
+                query["$or"] = [
+                    {"name": {"$regex": q, "$options": "i"}},  # Case-insensitive name search
+                    {"description": {"$regex": q, "$options": "i"}},  # Description search
+                    {"address": {"$regex": q, "$options": "i"}}  # Address search
+                ]
+            if category:
+                query["category"] = category
+            if source:
+                query["source"] = source
+
+            if district:
+                district_doc = await District.find_one({"properties.STADTTNAME": district})
+                if district_doc:
+                    query["location"] = {"$geoWithin": {"$geometry": district_doc.geometry}}
+
+            if has_website is not None:
+                if has_website:
+                    query["website"] = {"$ne": None}
+                else:
+                    query["$or"] = [{"website": None}, {"website": ""}]
+            if has_phone is not None:
+                if has_phone:
+                    query["phone"] = {"$ne": None}
+                else:
+                    query["$or"] = [{"phone": None}, {"phone": ""}]
+            if has_opening_hours is not None:
+                if has_opening_hours:
+                    query["opening_hours"] = {"$ne": None}
+                else:
+                    query["$or"] = [{"opening_hours": None}, {"opening_hours": ""}]
+
+            if created_after or created_before:
+                date_query = {}
+                if created_after:
+                    date_query["$gte"] = datetime.fromisoformat(created_after.replace("Z", "+00:00"))
+                if created_before:
+                    date_query["$lte"] = datetime.fromisoformat(created_before.replace("Z", "+00:00"))
+                query["created_at"] = date_query
 
-        if created_after or created_before:
-            date_query = {}
-            if created_after:
-                date_query["$gte"] = datetime.fromisoformat(created_after.replace("Z", "+00:00"))
-            if created_before:
-                date_query["$lte"] = datetime.fromisoformat(created_before.replace("Z", "+00:00"))
-            query["created_at"] = date_query
+            if min_rating is not None:
+                # Precomputed average; backed by the (is_active, rating_avg, rating_count) index
+                query["rating_avg"] = {"$gte": min_rating}
 
-        sort_direction = 1 if sort_order == "asc" else -1
-        sort_criteria = [(sort_by, sort_direction)]
+            sort_direction = 1 if sort_order == "asc" else -1
+            if sort_by == "rating":
+                sort_criteria = [("rating_avg", sort_direction), ("rating_count", sort_direction)]
+            else:
+                sort_criteria = [(sort_by, sort_direction)]
+            # Name order follows German collation, served by the collated name indexes
+            find_options = {"collation": GERMAN_COLLATION} if sort_by == "name" else {}
+
+            sites = await CulturalSite.find(query, **find_options).sort(sort_criteria).skip(skip).limit(limit).to_list()
+            total_count = await CulturalSite.find(query).count()
+            return sites, total_count
 
-        sites = await CulturalSite.find(query).sort(sort_criteria).skip(skip).limit(limit).to_list()
-        total_count = await CulturalSite.find(query).count()
+        cache_key = canonical_key("advanced", {
+            "q": q.lower() if q else None,  # Matching is case-insensitive
+            "category": category,
+            "district": district,
+            "source": source,
+            "has_website": has_website,
+            "has_phone": has_phone,
+            "has_opening_hours": has_opening_hours,
+            "created_after": created_after,
+            "created_before": created_before,
+            "min_rating": min_rating,
+            "sort_by": sort_by,
+            "sort_order": sort_order,
+            "limit": limit,
+            "skip": skip
+        })
+        sites, total_count = await search_cache.get_or_compute(cache_key, run_search)
 
         return {
             "sites": sites,
@@ -90,7 +128,8 @@ async def advanced_search(
                 "has_phone": has_phone,
                 "has_opening_hours": has_opening_hours,
                 "created_after": created_after,
-                "created_before": created_before
+                "created_before": created_before,
+                "min_rating": min_rating
             },
             "pagination": {
                 "limit": limit,
@@ -119,19 +158,32 @@ async def search_nearby_sites(
         if not (-180 <= lng <= 180):
             raise HTTPException(status_code=400, detail="Longitude must be between -180 and 180")
 
-        geo_query = {
-            "location": {
-                "$near": {
-                    "$geometry": {"type": "Point", "coordinates": [lng, lat]},
-                    "$maxDistance": radius
-                }
-            },
-            "is_active": True
-        }
-        if category:
-            geo_query["category"] = category
+        # Snapped so repeated searches around the same spot share one cache entry
+        grid_lat, grid_lng = snap_to_grid(lat), snap_to_grid(lng)
+
+        async def run_search():
+            geo_query = {
+                "location": {
+                    "$near": {
+                        "$geometry": {"type": "Point", "coordinates": [grid_lng, grid_lat]},
+                        "$maxDistance": radius
+                    }
+                },
+                "is_active": True
+            }
+            if category:
+                geo_query["category"] = category
+
+            return await CulturalSite.find(geo_query).limit(limit).to_list()
 
-        sites = await CulturalSite.find(geo_query).limit(limit).to_list()
+        cache_key = canonical_key("nearby", {
+            "lat": grid_lat,
+            "lng": grid_lng,
+            "radius": radius,
+            "category": category,
+            "limit": limit
+        })
+        sites = await search_cache.get_or_compute(cache_key, run_search)
         return {
             "sites": sites,
             "total": len(sites),
@@ -156,8 +208,13 @@ async def autocomplete_search(q: str, limit: int = 10):
         if len(q) < 2:
             return {"suggestions": []}
 
-        regex_query = {"name": {"$regex": f"^{q}", "$options": "i"}, "is_active": True} 
-        sites = await CulturalSite.find(regex_query).sort("name").limit(limit * 2).to_list()
+        async def run_search():
+            regex_query = {"name": {"$regex": f"^{q}", "$options": "i"}, "is_active": True}
+            return await CulturalSite.find(regex_query, collation=GERMAN_COLLATION).sort("name").limit(limit * 2).to_list()
+
+        sites = await search_cache.get_or_compute(
+            canonical_key("autocomplete", {"q": q.lower(), "limit": limit}), run_search
+        )
         seen_names = set()
         unique_sites = []
         for site in sites:
@@ -181,45 +238,80 @@ async def autocomplete_search(q: str, limit: int = 10):
 async def get_filter_values():
     """Get available values for filters (for UI dropdowns)"""
     try:
-        sources = await CulturalSite.distinct("source", {"is_active": True})
-        districts_with_sites = await CulturalSite.aggregate([
-            {"$match": {"is_active": True}},
-            {"$group": {"_id": "$properties.district", "count": {"$sum": 1}}},
-            {"$match": {"_id": {"$ne": None}}},
-            {"$sort": {"_id": 1}}
-        ]).to_list()
-
-        oldest_site = await CulturalSite.find({"is_active": True}).sort([("created_at", 1)]).limit(1).to_list()
-        newest_site = await CulturalSite.find({"is_active": True}).sort([("created_at", -1)]).limit(1).to_list()
+        values = await filter_values_summary.get()
 
         return {
             "categories": [cat.value for cat in CategoryType],
-            "sources": sources,
-            "districts": [d["_id"] for d in districts_with_sites if d["_id"]],
+            "sources": values["sources"],
+            "districts": values["districts"],
             "date_range": {
-                "oldest": oldest_site[0].created_at if oldest_site else None,
-                "newest": newest_site[0].created_at if newest_site else None
+                "oldest": values["oldest"],
+                "newest": values["newest"]
             },
-            "sort_options": ["name", "created_at", "updated_at"],
+            "sort_options": ["name", "created_at", "updated_at", "rating"],
             "sort_orders": ["asc", "desc"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get filter values: {str(e)}")
 
 
+@router.get("/cache/stats")
+async def get_search_cache_stats():
+    """Get search result cache statistics (hit ratio, size, coalesced requests)"""
+    return search_cache.stats()
+
+
+@router.get("/trending")
+async def get_trending_sites(
+    lat: float,
+    lng: float,
+    radius: int = 2000,
+    category: Optional[CategoryType] = None,
+    limit: int = 20
+):
+    """Sites trending near a point: decayed favorite/view/visit activity within radius meters"""
+    if not (-90 <= lat <= 90):
+        raise HTTPException(status_code=400, detail="Latitude must be between -90 and 90")
+    if not (-180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Longitude must be between -180 and 180")
+    if radius <= 0 or radius > TRENDING_MAX_RADIUS_METERS:
+        raise HTTPException(status_code=400, detail=f"radius must be between 0 and {TRENDING_MAX_RADIUS_METERS} meters")
+    try:
+        ranked = trending_sites.nearby(lat, lng, radius / 1000, limit=limit, category=category)
+        if not ranked:
+            return {"sites": [], "total": 0, "center": {"lat": lat, "lng": lng}, "radius_meters": radius, "warming_up": ranked is None}
+
+        docs = await CulturalSite.find({"_id": {"$in": [ObjectId(r["site_id"]) for r in ranked]}, "is_active": True}).to_list()
+        by_id = {str(site.id): site for site in docs}
+        sites = [
+            {**by_id[r["site_id"]].model_dump(mode="json", by_alias=True), "trending_score": r["score"], "distance_km": r["distance_km"]}
+            for r in ranked if r["site_id"] in by_id
+        ]
+        return {"sites": sites, "total": len(sites), "center": {"lat": lat, "lng": lng}, "radius_meters": radius, "warming_up": False}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get trending sites: {str(e)}")
+
+
 @router.get("/popular")
 async def get_popular_sites(category: Optional[CategoryType] = None, limit: int = 10):
     """Get popular sites based on view count and favorites"""
     try:
-        query = {"is_active": True}
-        if category:
-            query["category"] = category
-
-        popular_sites = await CulturalSite.find(query).sort([
-            ("favorite_count", -1),
-            ("view_count", -1),
-            ("created_at", -1)
-        ]).limit(limit).to_list()
+        site_ids = popularity_leaderboard.top(category, limit)
+        if site_ids is not None:
+            docs = await CulturalSite.find({"_id": {"$in": [ObjectId(sid) for sid in site_ids]}}).to_list()
+            by_id = {str(site.id): site for site in docs}
+            popular_sites = [by_id[sid] for sid in site_ids if sid in by_id]
+        else:
+            # Cold start: served by the compound popularity index until the leaderboard is loaded
+            query = {"is_active": True}
+            if category:
+                query["category"] = category
+
+            popular_sites = await CulturalSite.find(query).sort([
+                ("favorite_count", -1),
+                ("view_count", -1),
+                ("created_at", -1)
+            ]).limit(limit).to_list()
 
         return {
             "sites": popular_sites,
@@ -0,0 +1,88 @@
+# Backend/schema_version.py - Index definition fingerprint so restarts can skip Beanie's index sync
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type
+
+from beanie import Document
+from beanie.odm.utils.init import Initializer
+
+# "auto": sync indexes only when the stored fingerprint differs; "always": sync on every start
+STARTUP_INDEX_SYNC = os.getenv("STARTUP_INDEX_SYNC", "auto").lower()
+
+SCHEMA_META_COLLECTION = "schema_meta"
+INDEX_MARKER_ID = "indexes"
+
+
+def _encode(value: Any) -> Any:
+    # IndexModel and Collation expose their server documents; SON keeps key order
+    document = getattr(value, "document", None)
+    if document is not None:
+        return dict(document)
+    return str(value)
+
+
+def index_fingerprint(models: List[Type[Document]]) -> str:
+    """Hash of every model's collection name and declared indexes"""
+    spec = [
+        [model.Settings.name, getattr(model.Settings, "indexes", [])]
+        for model in sorted(models, key=lambda m: m.Settings.name)
+    ]
+    payload = json.dumps(spec, default=_encode, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+async def read_index_marker(database) -> Optional[str]:
+    """Fingerprint recorded by the last process that synced indexes (one read)"""
+    marker = await database[SCHEMA_META_COLLECTION].find_one({"_id": INDEX_MARKER_ID}, {"fingerprint": 1})
+    return marker.get("fingerprint") if marker else None
+
+
+async def write_index_marker(database, fingerprint: str):
+    await database[SCHEMA_META_COLLECTION].update_one(
+        {"_id": INDEX_MARKER_ID},
+        {"$set": {"fingerprint": fingerprint, "synced_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+class _Initializer(Initializer):
+    """Beanie's initializer with index creation optionally left out
+    (init_beanie in this Beanie version has no such switch)"""
+
+    def __init__(self, *args, skip_indexes: bool = False, **kwargs):
+        self.skip_indexes = skip_indexes
+        super().__init__(*args, **kwargs)
+
+    async def init_indexes(self, cls, allow_index_dropping: bool = False):
+        if not self.skip_indexes:
+            await super().init_indexes(cls, allow_index_dropping)
+
+
+async def init_models(database, models: List[Type[Document]], skip_indexes: bool = False):
+    """init_beanie, optionally without creating/checking indexes"""
+    await _Initializer(database=database, document_models=models, skip_indexes=skip_indexes)
+
+
+class StartupPhases:
+    """Wall time of each startup step, printed as one line"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def summary(self) -> str:
+        total = sum(self.phases.values())
+        parts = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.phases.items())
+        return f"Startup phases: {parts} (total {total:.0f} ms)"
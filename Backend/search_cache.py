@@ -0,0 +1,115 @@
+# Backend/search_cache.py - Result cache with request coalescing for the search endpoints
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "60"))
+# Nearby searches are snapped to this grid (degrees, ~0.001 = 110 m); 0 disables snapping
+SEARCH_CACHE_GRID_DEGREES = float(os.getenv("SEARCH_CACHE_GRID_DEGREES", "0.001"))
+
+
+def snap_to_grid(value: float, grid: float = SEARCH_CACHE_GRID_DEGREES) -> float:
+    """Snap a coordinate to the cache grid so nearby requests share a cache entry"""
+    if grid <= 0:
+        return value
+    return round(round(value / grid) * grid, 7)
+
+
+def canonical_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+    """Order-independent cache key; unset parameters are dropped and enums reduced to their values"""
+    items = [
+        (name, getattr(value, "value", value))
+        for name, value in params.items()
+        if value is not None
+    ]
+    return (endpoint, tuple(sorted(items)))
+
+
+class SearchCache:
+    """Bounded LRU cache with TTL, single-flight misses and generation-based invalidation"""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, running compute at most once for concurrent misses"""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return await compute()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute(key, compute, self._generation))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shielded so a disconnecting client does not cancel the query for the other waiters
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        try:
+            value = await compute()
+            # Results computed before an invalidation may already be stale
+            if generation == self._generation:
+                self._store(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self):
+        """Drop all cached results (called by the site write paths)"""
+        self._generation += 1
+        self._entries.clear()
+        self._inflight.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "grid_degrees": SEARCH_CACHE_GRID_DEGREES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global cache instance for /api/search
+search_cache = SearchCache()
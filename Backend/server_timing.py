@@ -0,0 +1,199 @@
+# Backend/server_timing.py - Per-request phase timings reported in the Server-Timing header
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+
+from request_context import bearer_token
+
+# Who gets the header: "admin" (admin bearer tokens only), "all" or "off". Per-phase
+# timings (auth in particular) are a timing side channel, so not for anonymous clients.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "admin").lower()
+
+# Header order; phases overlap (auth includes its own db time, concurrent db commands add up)
+PHASES = ("auth", "db", "handler", "model", "serialize")
+PHASE_DESCRIPTIONS = {
+    "auth": "Token and user checks",
+    "db": "MongoDB commands",
+    "handler": "Route handler",
+    "model": "Beanie document construction",
+    "serialize": "Response validation and JSON"
+}
+
+
+class RequestTimings:
+    """Accumulated seconds and call counts per phase (updated from the driver's threads too)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: Dict[str, List[float]] = {}
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            entry = self._phases.get(phase)
+            if entry is None:
+                self._phases[phase] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def header(self) -> str:
+        with self._lock:
+            phases = dict(self._phases)
+        parts = []
+        for name in PHASES + tuple(sorted(set(phases) - set(PHASES))):
+            if name not in phases:
+                continue
+            seconds, count = phases[name]
+            desc = PHASE_DESCRIPTIONS.get(name, name)
+            if count > 1:
+                desc = f"{desc} ({int(count)})"
+            parts.append(f'{name};dur={seconds * 1000:.2f};desc="{desc}"')
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+# Timings of the request being handled. Motor copies the context into its
+# worker threads, so the command listener adds to the same object.
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def add_timing(phase: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str):
+    """Time a block (sync or around awaits) as a phase of the current request"""
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def _timed_async(phase: str, func):
+    async def wrapper(*args, **kwargs):
+        with timed(phase):
+            return await func(*args, **kwargs)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def _timed_sync(phase: str, func):
+    def wrapper(*args, **kwargs):
+        timings = request_timings.get()
+        if timings is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.add(phase, time.perf_counter() - started)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+_installed = False
+
+
+def install_phase_hooks():
+    """Wrap the FastAPI and Beanie steps that have no hook of their own.
+
+    - fastapi.routing.run_endpoint_function -> handler
+    - fastapi.routing.serialize_response -> serialize (response_model validation, jsonable_encoder)
+    - Beanie's parse_obj in find/cursor queries -> model
+    Both libraries look these names up in their module globals at call time.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    import fastapi.routing
+    import beanie.odm.queries.cursor
+    import beanie.odm.queries.find
+
+    fastapi.routing.run_endpoint_function = _timed_async("handler", fastapi.routing.run_endpoint_function)
+    fastapi.routing.serialize_response = _timed_async("serialize", fastapi.routing.serialize_response)
+    for module in (beanie.odm.queries.cursor, beanie.odm.queries.find):
+        module.parse_obj = _timed_sync("model", module.parse_obj)
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default response class; json.dumps counts towards the serialize phase"""
+
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return super().render(content)
+
+
+class PhaseTimingListener(monitoring.CommandListener):
+    """Adds MongoDB command durations to the current request's db phase"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        add_timing("db", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        add_timing("db", event.duration_micros / 1e6)
+
+
+# Global listener, registered on the Motor client in database.py
+phase_timing_listener = PhaseTimingListener()
+
+
+class ServerTimingMiddleware:
+    """Collects phase timings and sends them as a Server-Timing header.
+
+    is_admin_token decides who gets them in "admin" mode (passed in by main.py:
+    auth itself reports its phase through this module).
+    """
+
+    def __init__(self, app, is_admin_token: Callable[[str], Awaitable[bool]], mode: str = SERVER_TIMING):
+        self.app = app
+        self.is_admin_token = is_admin_token
+        self.mode = mode
+
+    async def _enabled_for(self, scope) -> bool:
+        if self.mode == "all":
+            return True
+        if self.mode == "admin":
+            token = bearer_token(scope)
+            return token is not None and await self.is_admin_token(token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not await self._enabled_for(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
@@ -0,0 +1,63 @@
+# Backend/site_names.py - Cached site id -> name/category lookup for list endpoints
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import ObjectId
+
+from models import CulturalSite
+
+SITE_NAME_CACHE_MAX_ENTRIES = int(os.getenv("SITE_NAME_CACHE_MAX_ENTRIES", "10000"))
+SITE_NAME_CACHE_TTL_SECONDS = float(os.getenv("SITE_NAME_CACHE_TTL_SECONDS", "600"))
+
+
+class SiteNameCache:
+    """Bounded LRU of site names and categories; misses are fetched with one $in query"""
+
+    def __init__(self, max_entries: int = SITE_NAME_CACHE_MAX_ENTRIES, ttl_seconds: float = SITE_NAME_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, str]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, site_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, str]]]:
+        """{site_id: {"name", "category"}} (None for unknown sites)"""
+        now = time.monotonic()
+        found: Dict[str, Optional[Dict[str, str]]] = {}
+        missing = []
+        for site_id in dict.fromkeys(site_ids):
+            entry = self._entries.get(site_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(site_id)
+                found[site_id] = entry[1]
+                self.hits += 1
+            else:
+                missing.append(site_id)
+
+        if missing:
+            self.misses += len(missing)
+            object_ids = [ObjectId(sid) for sid in missing if ObjectId.is_valid(sid)]
+            docs = await CulturalSite.get_motor_collection().find(
+                {"_id": {"$in": object_ids}}, {"name": 1, "category": 1}
+            ).to_list(None) if object_ids else []
+            fetched = {str(doc["_id"]): {"name": doc.get("name"), "category": doc.get("category")} for doc in docs}
+            for site_id in missing:
+                found[site_id] = fetched.get(site_id)
+                self._store(site_id, found[site_id], now)
+        return found
+
+    def _store(self, site_id: str, value: Optional[Dict[str, str]], now: float):
+        self._entries[site_id] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(site_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, site_id: str):
+        self._entries.pop(site_id, None)
+
+
+# Global cache, invalidated by summaries.record_site_change
+site_name_cache = SiteNameCache()
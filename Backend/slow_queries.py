@@ -0,0 +1,210 @@
+# Backend/slow_queries.py - Ring buffer of slow MongoDB commands with their query shapes
+
+import asyncio
+import copy
+import json
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from query_advisor import RECORDED_COMMANDS, shape_of, shape_id
+from request_context import current_route
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+# Fraction of slow reads that are re-run with explain("executionStats")
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+# Optional JSON lines file receiving every slow command (empty = disabled)
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "")
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+
+def _explain_summary(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """docs/keys examined and returned from an executionStats explain (find or aggregate)"""
+    stats = explain.get("executionStats")
+    if stats is None:
+        for stage in explain.get("stages") or []:
+            cursor = stage.get("$cursor") or {}
+            if "executionStats" in cursor:
+                stats = cursor["executionStats"]
+                break
+    stats = stats or {}
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis")
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Records commands slower than the threshold; called from the driver's threads"""
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        buffer_size: int = SLOW_QUERY_BUFFER_SIZE,
+        explain_sample_rate: float = SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        log_file: str = SLOW_QUERY_LOG_FILE
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.log_file = log_file
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Tuple[str, Dict[str, Any], str]] = {}
+        self._entries: deque = deque(maxlen=buffer_size)
+        self._explain_queue: List[Tuple[Dict[str, Any], str, Dict[str, Any]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._client = None
+
+        self.recorded = 0
+        self.explained = 0
+
+    # --- CommandListener interface ---
+
+    def started(self, event):
+        if event.command_name not in RECORDED_COMMANDS:
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.database_name, event.command, current_route()
+            )
+
+    def succeeded(self, event):
+        self._finish(event, None)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure.get("errmsg", "")) if isinstance(event.failure, dict) else str(event.failure))
+
+    def _finish(self, event, error: Optional[str]):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        database, command, route = pending
+        collection = command.get(event.command_name)
+        shape = shape_of(collection if isinstance(collection, str) else "", event.command_name, command)
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "route": route,
+            "database": database,
+            "collection": shape["collection"],
+            "command": event.command_name,
+            "shape_id": shape_id(shape),
+            "shape": shape,
+            "error": error
+        }
+
+        sample = None
+        if event.command_name in EXPLAINABLE_COMMANDS and error is None and random.random() < self.explain_sample_rate:
+            sample = {k: copy.deepcopy(v) for k, v in command.items()
+                      if not k.startswith("$") and k not in ("lsid", "txnNumber", "cursor")}
+            if event.command_name == "aggregate":
+                sample["cursor"] = {}
+            entry["explain"] = "pending"
+
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+            if sample is not None:
+                self._explain_queue.append((entry, database, sample))
+        if sample is None:
+            self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]):
+        if not self.log_file:
+            return
+        try:
+            with self._lock, open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            print(f"Failed to write slow query log: {e}")
+
+    # --- Sampled explain (runs on the event loop) ---
+
+    def start(self, client):
+        """Start the explain worker (called from the app lifespan)"""
+        self._client = client
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(1)
+            with self._lock:
+                queue, self._explain_queue = self._explain_queue, []
+            for entry, database, command in queue:
+                try:
+                    explain = await self._client[database].command({"explain": command, "verbosity": "executionStats"})
+                    entry["explain"] = _explain_summary(explain)
+                    self.explained += 1
+                except Exception as e:
+                    entry["explain"] = {"error": str(e)}
+                self._write(entry)
+
+    # --- Reporting ---
+
+    def entries(self, limit: int = 100, route: Optional[str] = None, shape: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent slow commands first"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if route:
+            entries = [e for e in entries if route in e["route"]]
+        if shape:
+            entries = [e for e in entries if e["shape_id"] == shape]
+        return entries[:limit]
+
+    def by_shape(self) -> List[Dict[str, Any]]:
+        """Buffered slow commands grouped by shape and route, slowest total first"""
+        groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        with self._lock:
+            entries = list(self._entries)
+        for e in entries:
+            group = groups.setdefault((e["shape_id"], e["route"]), {
+                "shape_id": e["shape_id"], "route": e["route"], "shape": e["shape"],
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0
+            })
+            group["count"] += 1
+            group["total_ms"] = round(group["total_ms"] + e["duration_ms"], 3)
+            group["max_ms"] = max(group["max_ms"], e["duration_ms"])
+        return sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "buffered": len(self._entries),
+            "buffer_size": self._entries.maxlen,
+            "recorded": self.recorded,
+            "explained": self.explained,
+            "explain_sample_rate": self.explain_sample_rate,
+            "log_file": self.log_file or None
+        }
+
+
+# Global log, registered on the Motor client in database.py
+slow_query_log = SlowQueryLog()
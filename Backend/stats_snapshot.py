@@ -0,0 +1,266 @@
+# Backend/stats_snapshot.py - In-memory statistics snapshots for the stats router
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from models import (
+    CulturalSite, ParkingLot, District, CategoryType, Category,
+    User, Favorite, Review, UserActivity
+)
+
+# Full recount interval; picks up imports and writes made by other worker processes
+QUICK_STATS_RESYNC_SECONDS = int(os.getenv("QUICK_STATS_RESYNC_SECONDS", "300"))
+
+# Sources reported separately by /api/stats/quick
+CHEMNITZ_SOURCE = "chemnitz_geojson"
+SACHSEN_SOURCE = "sachsen_geojson"
+
+OVERVIEW_REFRESH_SECONDS = int(os.getenv("OVERVIEW_REFRESH_SECONDS", "60"))
+# Concurrent per-district $geoWithin counts during an overview refresh
+OVERVIEW_DISTRICT_CONCURRENCY = int(os.getenv("OVERVIEW_DISTRICT_CONCURRENCY", "8"))
+
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+class QuickStats:
+    """Active site counts by source and category, plus parking/district totals"""
+
+    def __init__(self):
+        self._sites_by_source: Dict[str, int] = {}
+        self._sites_by_category: Dict[str, int] = {}
+        self._total_sites = 0
+        self._total_parking = 0
+        self._total_districts = 0
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def get(self) -> Dict[str, Any]:
+        """Current snapshot; only the first call (cold start) waits for the database"""
+        if not self.is_loaded:
+            self.schedule_refresh()
+            await asyncio.shield(self._refresh_task)
+            if not self.is_loaded:
+                raise RuntimeError("quick stats could not be computed")
+        elif time.monotonic() - self._loaded_at > QUICK_STATS_RESYNC_SECONDS:
+            self.schedule_refresh()  # Serve the current snapshot while recounting
+
+        return {
+            "total_sites": self._total_sites,
+            "chemnitz_sites": self._sites_by_source.get(CHEMNITZ_SOURCE, 0),
+            "sachsen_sites": self._sites_by_source.get(SACHSEN_SOURCE, 0),
+            "total_parking": self._total_parking,
+            "total_districts": self._total_districts,
+            "sites_by_category": {category.value: self._sites_by_category.get(category.value, 0) for category in CategoryType},
+            "snapshot_age_seconds": round(time.monotonic() - self._loaded_at, 1)
+        }
+
+    def schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def refresh(self):
+        """One $facet aggregation over active sites, concurrent with the other counts"""
+        facet = CulturalSite.aggregate([
+            {"$match": {"is_active": True}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "by_source": [{"$group": {"_id": "$source", "count": {"$sum": 1}}}],
+                "by_category": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}]
+            }}
+        ]).to_list()
+        try:
+            facets, total_parking, total_districts = await asyncio.gather(
+                facet,
+                ParkingLot.get_motor_collection().count_documents({"is_active": True}),
+                District.get_motor_collection().estimated_document_count()
+            )
+        except Exception as e:
+            print(f"Failed to compute quick stats: {e}")
+            return
+
+        result = facets[0] if facets else {}
+        total = result.get("total") or [{"count": 0}]
+        self._total_sites = total[0]["count"]
+        self._sites_by_source = {_value(g["_id"]): g["count"] for g in result.get("by_source", [])}
+        self._sites_by_category = {_value(g["_id"]): g["count"] for g in result.get("by_category", [])}
+        self._total_parking = total_parking
+        self._total_districts = total_districts
+        self._loaded_at = time.monotonic()
+
+    def apply(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply a site change (facets from summaries.site_facets, None = not active)"""
+        if not self.is_loaded:
+            return
+        for facets, delta in ((before, -1), (after, 1)):
+            if not facets:
+                continue
+            self._total_sites += delta
+            source = facets["source"]
+            category = _value(facets["category"])
+            self._sites_by_source[source] = max(0, self._sites_by_source.get(source, 0) + delta)
+            self._sites_by_category[category] = max(0, self._sites_by_category.get(category, 0) + delta)
+
+
+# Global snapshot, kept current by summaries.record_site_change
+quick_stats = QuickStats()
+
+
+class OverviewStats:
+    """Admin dashboard statistics, recomputed by a background task on an interval"""
+
+    def __init__(self, interval: int = OVERVIEW_REFRESH_SECONDS):
+        self.interval = interval
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._computed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    def start(self):
+        """Start the periodic refresher (called from the app lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> bool:
+        """Recompute now; concurrent callers share one computation"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._compute())
+        return await asyncio.shield(self._refresh_task)
+
+    async def get(self) -> Dict[str, Any]:
+        """Latest snapshot with its age (computed on the spot only before the first refresh)"""
+        if self._snapshot is None and not await self.refresh():
+            raise RuntimeError("overview statistics could not be computed")
+        return {
+            **self._snapshot,
+            "snapshot_age_seconds": round(time.monotonic() - self._computed_at, 1),
+            "refresh_interval_seconds": self.interval
+        }
+
+    async def _compute(self) -> bool:
+        started = time.perf_counter()
+        try:
+            sites_facet, users_facet, collections, db_stats, districts = await asyncio.gather(
+                self._site_counts(),
+                User.aggregate([{"$facet": {
+                    "total": [{"$count": "count"}],
+                    "active": [{"$match": {"is_active": True}}, {"$count": "count"}],
+                    "admins": [{"$match": {"is_admin": True}}, {"$count": "count"}]
+                }}]).to_list(),
+                self._collection_counts(),
+                CulturalSite.get_motor_collection().database.command("dbStats"),
+                self._district_counts()
+            )
+        except Exception as e:
+            self.failed_refreshes += 1
+            print(f"Failed to refresh overview statistics: {e}")
+            return False
+
+        def first_count(facet: Dict[str, Any], name: str) -> int:
+            values = facet.get(name) or []
+            return values[0]["count"] if values else 0
+
+        users = users_facet[0] if users_facet else {}
+        self._snapshot = {
+            **sites_facet,
+            "total_users": first_count(users, "total"),
+            "active_users": first_count(users, "active"),
+            "admin_users": first_count(users, "admins"),
+            "sites_by_district": districts,
+            "database_stats": {
+                **collections,
+                "database_size_mb": round(db_stats["dataSize"] / (1024 * 1024), 2),
+                "total_collections": db_stats["collections"]
+            },
+            "computed_at": datetime.utcnow(),
+            "compute_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        self._computed_at = time.monotonic()
+        self.refreshes += 1
+        return True
+
+    async def _site_counts(self) -> Dict[str, Any]:
+        facets = await CulturalSite.aggregate([{"$facet": {
+            "by_status": [{"$group": {"_id": "$is_active", "count": {"$sum": 1}}}],
+            "by_category": [{"$match": {"is_active": True}}, {"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+            "by_source": [{"$match": {"is_active": True}}, {"$group": {"_id": "$source", "count": {"$sum": 1}}}]
+        }}]).to_list()
+        result = facets[0] if facets else {}
+        by_status = {g["_id"]: g["count"] for g in result.get("by_status", [])}
+        by_category = {_value(g["_id"]): g["count"] for g in result.get("by_category", [])}
+        active = by_status.get(True, 0)
+        total = sum(by_status.values())
+        return {
+            "total_sites": total,
+            "active_sites": active,
+            "inactive_sites": total - active,
+            "sites_by_category": {category.value: by_category.get(category.value, 0) for category in CategoryType},
+            "sites_by_source": {_value(g["_id"]): g["count"] for g in result.get("by_source", [])}
+        }
+
+    async def _collection_counts(self) -> Dict[str, int]:
+        """Per-collection document counts from collection metadata (no scans)"""
+        models = {
+            "cultural_sites": CulturalSite,
+            "users": User,
+            "categories": Category,
+            "parking_lots": ParkingLot,
+            "reviews": Review,
+            "activities": UserActivity,
+            "favorites": Favorite
+        }
+        counts = await asyncio.gather(*(m.get_motor_collection().estimated_document_count() for m in models.values()))
+        return dict(zip(models, counts))
+
+    async def _district_counts(self) -> Dict[str, int]:
+        """Active sites within each district boundary"""
+        semaphore = asyncio.Semaphore(OVERVIEW_DISTRICT_CONCURRENCY)
+        districts = await District.get_motor_collection().find({}, {"name": 1, "geometry": 1}).to_list(None)
+        sites = CulturalSite.get_motor_collection()
+
+        async def count(district: Dict[str, Any]) -> int:
+            async with semaphore:
+                return await sites.count_documents({
+                    "is_active": True,
+                    "location": {"$geoWithin": {"$geometry": district["geometry"]}}
+                })
+
+        counts = await asyncio.gather(*(count(d) for d in districts))
+        return {d.get("name") or str(d["_id"]): n for d, n in sorted(zip(districts, counts), key=lambda x: -x[1])}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "snapshot_age_seconds": round(time.monotonic() - self._computed_at, 1) if self._computed_at else None,
+            "refresh_interval_seconds": self.interval
+        }
+
+
+# Global refresher, started in main.lifespan
+overview_stats = OverviewStats()
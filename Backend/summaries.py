@@ -0,0 +1,181 @@
+# Backend/summaries.py - Materialized summaries maintained by the site write paths
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from models import CulturalSite, SiteSummary
+from leaderboard import popularity_leaderboard
+from search_cache import search_cache
+from trending import trending_sites
+from site_names import site_name_cache
+from stats_snapshot import quick_stats
+
+
+def _encode_key(value: str) -> str:
+    """Make a value safe to use as a MongoDB field name"""
+    return value.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _decode_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def site_facets(site: CulturalSite) -> Optional[Dict[str, Any]]:
+    """Snapshot of the site fields the summaries depend on (None for inactive sites)"""
+    if not site.is_active:
+        return None
+    return {
+        "id": str(site.id),
+        "source": site.source,
+        "district": (site.properties or {}).get("district"),
+        "category": site.category,
+        "created_at": site.created_at,
+        "favorite_count": site.favorite_count,
+        "view_count": site.view_count,
+        "location": site.location.coordinates
+    }
+
+
+class FilterValuesSummary:
+    """Dropdown values for /api/search/filters/values, kept in one summary document"""
+
+    KEY = "filter_values"
+
+    async def get(self) -> Dict[str, Any]:
+        """Read the summary, rebuilding it if it is missing or its date range is stale"""
+        summary = await SiteSummary.find_one(SiteSummary.key == self.KEY)
+        if summary is None:
+            summary = await self.rebuild()
+        elif summary.date_range_stale:
+            summary = await self.refresh_date_range()
+
+        return {
+            "sources": sorted(_decode_key(k) for k, v in summary.sources.items() if v > 0),
+            "districts": sorted(_decode_key(k) for k, v in summary.districts.items() if v > 0),
+            "oldest": summary.oldest_created_at,
+            "newest": summary.newest_created_at
+        }
+
+    async def rebuild(self) -> SiteSummary:
+        """Recompute the summary from the cultural_sites collection"""
+        sources = await CulturalSite.aggregate([
+            {"$match": {"is_active": True}},
+            {"$group": {"_id": "$source", "count": {"$sum": 1}}}
+        ]).to_list()
+        districts = await CulturalSite.aggregate([
+            {"$match": {"is_active": True, "properties.district": {"$ne": None}}},
+            {"$group": {"_id": "$properties.district", "count": {"$sum": 1}}}
+        ]).to_list()
+        oldest, newest = await self._date_bounds()
+
+        fields = {
+            "sources": {_encode_key(str(s["_id"])): s["count"] for s in sources if s["_id"]},
+            "districts": {_encode_key(str(d["_id"])): d["count"] for d in districts if d["_id"]},
+            "oldest_created_at": oldest,
+            "newest_created_at": newest,
+            "date_range_stale": False,
+            "updated_at": datetime.utcnow()
+        }
+        await SiteSummary.get_motor_collection().update_one(
+            {"key": self.KEY}, {"$set": fields}, upsert=True
+        )
+        return SiteSummary(key=self.KEY, **fields)
+
+    async def refresh_date_range(self) -> SiteSummary:
+        """Recompute only the created_at bounds after a bound site was removed"""
+        oldest, newest = await self._date_bounds()
+        summary = await SiteSummary.get_motor_collection().find_one_and_update(
+            {"key": self.KEY},
+            {"$set": {
+                "oldest_created_at": oldest,
+                "newest_created_at": newest,
+                "date_range_stale": False,
+                "updated_at": datetime.utcnow()
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if summary is None:
+            return await self.rebuild()
+        summary.pop("_id", None)
+        return SiteSummary(**summary)
+
+    async def apply(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply a site change (facets before/after, None = not active) to the summary"""
+        increments: Dict[str, int] = {}
+
+        def count(facets: Dict[str, Any], delta: int):
+            path = f"sources.{_encode_key(str(facets['source']))}"
+            increments[path] = increments.get(path, 0) + delta
+            if facets.get("district"):
+                path = f"districts.{_encode_key(str(facets['district']))}"
+                increments[path] = increments.get(path, 0) + delta
+
+        if before:
+            count(before, -1)
+        if after:
+            count(after, 1)
+        increments = {k: v for k, v in increments.items() if v}
+
+        update: Dict[str, Any] = {}
+        if increments:
+            update["$inc"] = increments
+        if after and not before:
+            update["$min"] = {"oldest_created_at": after["created_at"]}
+            update["$max"] = {"newest_created_at": after["created_at"]}
+        if not update:
+            return
+
+        update["$set"] = {"updated_at": datetime.utcnow()}
+        collection = SiteSummary.get_motor_collection()
+        # No upsert: a missing summary is rebuilt in full on the next read
+        await collection.update_one({"key": self.KEY}, update)
+
+        if after and not before:
+            # $min never replaces a null bound (rebuilt while no site was active)
+            await collection.update_one(
+                {"key": self.KEY, "oldest_created_at": None},
+                {"$set": {"date_range_stale": True}}
+            )
+        if before and not after:
+            await collection.update_one(
+                {"key": self.KEY, "$or": [
+                    {"oldest_created_at": before["created_at"]},
+                    {"newest_created_at": before["created_at"]}
+                ]},
+                {"$set": {"date_range_stale": True}}
+            )
+
+    async def _date_bounds(self):
+        oldest = await CulturalSite.find({"is_active": True}).sort([("created_at", 1)]).limit(1).to_list()
+        newest = await CulturalSite.find({"is_active": True}).sort([("created_at", -1)]).limit(1).to_list()
+        return (
+            oldest[0].created_at if oldest else None,
+            newest[0].created_at if newest else None
+        )
+
+
+# Global summary instances
+filter_values_summary = FilterValuesSummary()
+
+
+async def record_site_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Propagate a site create/update/delete/restore to the materialized summaries"""
+    search_cache.invalidate()
+    for facets in (before, after):
+        if facets:
+            site_name_cache.invalidate(facets["id"])
+    try:
+        popularity_leaderboard.apply(before, after)
+        trending_sites.apply(before, after)
+        quick_stats.apply(before, after)
+        await filter_values_summary.apply(before, after)
+    except Exception as e:
+        # Summaries must never fail the write itself; a rebuild repairs them
+        print(f"Failed to update site summaries: {e}")
+
+
+async def rebuild_summaries():
+    """Rebuild all summaries from scratch (used after bulk imports)"""
+    await filter_values_summary.rebuild()
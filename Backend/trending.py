@@ -0,0 +1,225 @@
+# Backend/trending.py - Exponentially decayed site popularity bucketed by geohash cell
+
+import asyncio
+import heapq
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from models import CulturalSite, UserActivity
+from rollups import query_rollups
+from geo import haversine_km
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_GEOHASH_PRECISION = int(os.getenv("TRENDING_GEOHASH_PRECISION", "6"))  # ~1.2 x 0.6 km cells
+# Full reload from the hourly rollups; merges activity seen by other worker processes
+TRENDING_RESYNC_SECONDS = int(os.getenv("TRENDING_RESYNC_SECONDS", "600"))
+TRENDING_BOOTSTRAP_HOURS = int(os.getenv("TRENDING_BOOTSTRAP_HOURS", "72"))
+
+# Score added per activity (before decay)
+TRENDING_WEIGHTS = {
+    "view": 1.0,
+    "favorite": 5.0,
+    "unfavorite": -5.0,
+    "visit": 3.0,
+    "review": 3.0
+}
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lng: float, precision: int = TRENDING_GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int = TRENDING_GEOHASH_PRECISION) -> Tuple[float, float]:
+    """(lat, lng) size in degrees of a geohash cell"""
+    lng_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lng_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_cells(lat: float, lng: float, radius_km: float, precision: int = TRENDING_GEOHASH_PRECISION) -> Set[str]:
+    """Geohash cells intersecting the bounding box of a circle"""
+    dlat = radius_km / 111.32
+    dlng = radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    cell_lat, cell_lng = cell_size(precision)
+
+    cells = set()
+    y = lat - dlat
+    while True:
+        x = lng - dlng
+        while True:
+            cells.add(geohash(max(-90.0, min(90.0, y)), x, precision))
+            if x >= lng + dlng:
+                break
+            x = min(x + cell_lng, lng + dlng)
+        if y >= lat + dlat:
+            break
+        y = min(y + cell_lat, lat + dlat)
+    return cells
+
+
+class TrendingSites:
+    """Decayed activity scores of active sites, grouped by geohash cell.
+
+    Scores use forward decay: each activity adds weight * 2^((t - epoch) / half_life)
+    and reads divide by 2^((now - epoch) / half_life), so an update is O(1) and
+    never touches other sites. The epoch is reset on every resync.
+    """
+
+    def __init__(self, half_life_hours: float = TRENDING_HALF_LIFE_HOURS, precision: int = TRENDING_GEOHASH_PRECISION):
+        self.half_life = half_life_hours * 3600
+        self.precision = precision
+        self._sites: Dict[str, Tuple[float, float, str, Optional[str]]] = {}  # site_id -> lat, lng, cell, category
+        self._cells: Dict[str, Dict[str, float]] = {}  # cell -> site_id -> forward-decayed score
+        self._epoch = time.time()
+        self._loaded_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def start(self):
+        """Start the periodic resync (called from the app lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(TRENDING_RESYNC_SECONDS)
+
+    def schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def refresh(self):
+        """Rebuild the scores from the active sites and the recent hourly rollups"""
+        try:
+            sites = {}
+            cursor = CulturalSite.get_motor_collection().find({"is_active": True}, {"location": 1, "category": 1})
+            async for doc in cursor:
+                coordinates = (doc.get("location") or {}).get("coordinates") or []
+                if len(coordinates) == 2:
+                    lat, lng = coordinates[1], coordinates[0]
+                    sites[str(doc["_id"])] = (lat, lng, geohash(lat, lng, self.precision), doc.get("category"))
+
+            epoch = time.time()
+            now = datetime.utcnow()
+            buckets = await query_rollups("site", "hour", now - timedelta(hours=TRENDING_BOOTSTRAP_HOURS), now)
+            cells: Dict[str, Dict[str, float]] = {}
+            for bucket in buckets:
+                site = sites.get(bucket["key"])
+                if site is None:
+                    continue
+                # Bucket midpoint, relative to the new epoch
+                age = (now - bucket["bucket_start"]).total_seconds() - 1800
+                weight = sum(TRENDING_WEIGHTS.get(t, 0.0) * n for t, n in (bucket.get("counts") or {}).items())
+                if weight:
+                    cell = cells.setdefault(site[2], {})
+                    cell[bucket["key"]] = cell.get(bucket["key"], 0.0) + weight * 2 ** (-max(age, 0) / self.half_life)
+
+            for cell in cells.values():
+                for site_id in [s for s, score in cell.items() if score <= 0]:
+                    del cell[site_id]
+
+            self._sites = sites
+            self._cells = cells
+            self._epoch = epoch
+            self._loaded_at = time.monotonic()
+        except Exception as e:
+            print(f"Failed to load trending scores: {e}")
+
+    def record(self, site_id: str, activity_type: Any, weight: float = 1.0):
+        """Add one activity (view, favorite, ...) to the decayed score of a site"""
+        site = self._sites.get(site_id)
+        if site is None:
+            return
+        delta = TRENDING_WEIGHTS.get(getattr(activity_type, "value", activity_type), 0.0) * weight
+        if not delta:
+            return
+        cell = self._cells.setdefault(site[2], {})
+        score = cell.get(site_id, 0.0) + delta * 2 ** ((time.time() - self._epoch) / self.half_life)
+        if score > 0:
+            cell[site_id] = score
+        else:
+            cell.pop(site_id, None)
+
+    def observe(self, activity: UserActivity):
+        """Hook for the activity stream; sampled views are counted by the view tracker instead"""
+        if not (activity.metadata or {}).get("sampled"):
+            self.record(activity.site_id, activity.activity_type)
+
+    def apply(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply a site change (facets from summaries.site_facets, None = not active)"""
+        if not self.is_loaded:
+            return
+        score = 0.0
+        if before and before["id"] in self._sites:
+            old = self._sites.pop(before["id"])
+            score = self._cells.get(old[2], {}).pop(before["id"], 0.0)
+        if after and after.get("location"):
+            lng, lat = after["location"]
+            cell = geohash(lat, lng, self.precision)
+            self._sites[after["id"]] = (lat, lng, cell, getattr(after["category"], "value", after["category"]))
+            if score > 0:
+                self._cells.setdefault(cell, {})[after["id"]] = score
+
+    def nearby(self, lat: float, lng: float, radius_km: float, limit: int = 20, category: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Top trending sites within radius_km, or None while the scores are still cold"""
+        if not self.is_loaded:
+            self.schedule_refresh()
+            return None
+        category = getattr(category, "value", category)
+        decay = 2 ** (-(time.time() - self._epoch) / self.half_life)
+
+        candidates = []
+        for cell in covering_cells(lat, lng, radius_km, self.precision):
+            for site_id, score in self._cells.get(cell, {}).items():
+                site_lat, site_lng, _, site_category = self._sites[site_id]
+                if category and site_category != category:
+                    continue
+                distance_km = haversine_km(lat, lng, site_lat, site_lng)
+                if distance_km <= radius_km:
+                    candidates.append({"site_id": site_id, "score": round(score * decay, 4), "distance_km": round(distance_km, 3)})
+        return heapq.nlargest(limit, candidates, key=lambda c: c["score"])
+
+
+# Global instance, started in main.lifespan
+trending_sites = TrendingSites()
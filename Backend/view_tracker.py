@@ -0,0 +1,152 @@
+# Backend/view_tracker.py - Process-local view counters flushed to MongoDB in batches
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models import CulturalSite, UserActivity, ActivityType
+from activity_queue import activity_writer
+from leaderboard import popularity_leaderboard
+from trending import trending_sites
+from rollups import apply_rollups
+
+VIEW_FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_FLUSH_INTERVAL_SECONDS", "5"))
+# Fraction of views that are also logged as UserActivity records
+VIEW_ACTIVITY_SAMPLE_RATE = float(os.getenv("VIEW_ACTIVITY_SAMPLE_RATE", "0.1"))
+VIEW_MAX_PENDING_SAMPLES = int(os.getenv("VIEW_MAX_PENDING_SAMPLES", "5000"))
+
+
+class ViewTracker:
+    """Aggregates site views in memory; one bulk_write of $inc per flush interval"""
+
+    def __init__(self, flush_interval: float = VIEW_FLUSH_INTERVAL_SECONDS, sample_rate: float = VIEW_ACTIVITY_SAMPLE_RATE):
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self._counts: Dict[str, int] = {}
+        self._categories: Dict[str, str] = {}  # For the category rollups
+        self._samples: List[UserActivity] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, site_id: str, user_id: Optional[str] = None, site_name: Optional[str] = None, category: Optional[str] = None):
+        """Count one view; no database work happens here"""
+        self._counts[site_id] = self._counts.get(site_id, 0) + 1
+        if category:
+            self._categories[site_id] = category
+        self.recorded += 1
+        popularity_leaderboard.adjust(site_id, views=1)
+        trending_sites.record(site_id, ActivityType.VIEW)
+
+        if random.random() < self.sample_rate and len(self._samples) < VIEW_MAX_PENDING_SAMPLES:
+            self._samples.append(UserActivity(
+                user_id=user_id or "anonymous",
+                site_id=site_id,
+                activity_type=ActivityType.VIEW,
+                metadata={
+                    "site_name": site_name,
+                    "site_category": category,
+                    "sampled": True,
+                    "sample_rate": self.sample_rate
+                }
+            ))
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the periodic flusher (called from the app lifespan)"""
+        if not self.running:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out the remaining counts"""
+        if self.running:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """Write accumulated counts as one bulk_write and hand samples to the activity writer"""
+        counts, self._counts = self._counts, {}
+        samples, self._samples = self._samples, []
+
+        if counts:
+            started = time.perf_counter()
+            site_ids = list(counts)
+            operations = [
+                UpdateOne({"_id": ObjectId(site_id)}, {"$inc": {"view_count": counts[site_id]}})
+                for site_id in site_ids
+            ]
+            failed: List[str] = []
+            try:
+                await CulturalSite.get_motor_collection().bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: every operation not listed in writeErrors was applied
+                failed = [site_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+                print(f"Failed to flush view counts for {len(failed)} sites: {e}")
+            except Exception as e:
+                failed = site_ids
+                print(f"Failed to flush view counts: {e}")
+            if failed:
+                self.failed_flushes += 1
+                # Keep the counts that were not written for the next attempt
+                for site_id in failed:
+                    self._counts[site_id] = self._counts.get(site_id, 0) + counts.pop(site_id)
+            if counts:
+                self.flushed += sum(counts.values())
+                try:
+                    now = datetime.utcnow()
+                    await apply_rollups(
+                        (site_id, self._categories.get(site_id), ActivityType.VIEW, now, n)
+                        for site_id, n in counts.items()
+                    )
+                except Exception as e:
+                    print(f"Failed to roll up view counts: {e}")
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+        for activity in samples:
+            await activity_writer.enqueue(activity)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending_sites": len(self._counts),
+            "pending_views": sum(self._counts.values()),
+            "pending_samples": len(self._samples),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "flush_interval_seconds": self.flush_interval,
+            "sample_rate": self.sample_rate
+        }
+
+
+# Global tracker, started in main.lifespan and flushed in database.close_database
+view_tracker = ViewTracker()